@@ -0,0 +1,72 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from datetime import datetime
+
+from app.db.database import get_read_db
+from app.schemas.currency import RateRollingSeries, RateStatistics, parse_pair
+from app.services.analytics import rate_analytics, rolling_series
+from app.services.rate_cache import rate_cache
+from config import settings
+
+router = APIRouter()
+
+
+def _parse_pairs(value: str) -> list[tuple[str, str]]:
+    try:
+        return list(dict.fromkeys(parse_pair(item.strip()) for item in value.split(",") if item.strip()))
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e)
+        )
+
+
+@router.get("/rates", response_model=List[RateStatistics])
+async def get_rate_statistics(
+        pairs: Optional[str] = Query(default=None),
+        base_currency: Optional[str] = Query(default=None),
+        window: int = Query(default=20, ge=1, le=settings.ANALYTICS_MAX_POINTS),
+        db: AsyncSession = Depends(get_read_db)
+):
+    if pairs:
+        selected = _parse_pairs(pairs)
+    elif base_currency:
+        snapshot = await rate_cache.get()
+        selected = [
+            (rate["base_currency"], rate["target_currency"])
+            for rate in snapshot.select(base_currency.upper())
+        ]
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Either pairs or base_currency is required"
+        )
+
+    if len(selected) > settings.ANALYTICS_MAX_PAIRS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Analytics request is limited to {settings.ANALYTICS_MAX_PAIRS} pairs"
+        )
+
+    return await rate_analytics.statistics(db, selected, window)
+
+
+@router.get("/rates/{pair}/rolling", response_model=RateRollingSeries)
+async def get_rolling_statistics(
+        pair: str,
+        window: int = Query(default=20, ge=1, le=settings.ANALYTICS_MAX_POINTS),
+        start: Optional[datetime] = Query(default=None, alias="from"),
+        end: Optional[datetime] = Query(default=None, alias="to"),
+        limit: int = Query(default=1000, ge=1, le=10000),
+        db: AsyncSession = Depends(get_read_db)
+):
+    try:
+        base_currency, target_currency = parse_pair(pair)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e)
+        )
+
+    return await rolling_series(db, base_currency, target_currency, window, start, end, limit)
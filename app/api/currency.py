@@ -1,38 +1,220 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Body, Depends, HTTPException, Header, Query, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
-from app.websocket.currency_ws import websocket_manager
+from typing import List, Optional
+from datetime import datetime
 
-from app.db.database import get_db
+from app.db.database import get_db, get_read_db
 from app.schemas.currency import (
     CurrencyRateCreate,
     CurrencyRateUpdate,
+    CurrencyRateBulkUpdate,
     CurrencyRateInDB,
-    TaskLogInDB
+    ConversionResult,
+    RateHistoryPoint,
+    RateImportSummary,
+    TaskLogInDB,
+    parse_pair
 )
+from app.services.conversion import rate_matrix
 from app.services.currency_service import CurrencyService
-from app.nats.publisher import nats_publisher
-from app.db.models import TaskLog, CurrencyRate
+from app.services.rate_cache import rate_cache, etag_matches, make_etag
+from app.services.rate_events import publish_rate_changes
+from app.services.rate_import import RateImport, format_from_content_type
+from app.services.serialization import dumps, rate_to_dict
+from app.db.models import CurrencyRate
 from sqlalchemy import select
+from config import settings
 
 router = APIRouter()
 
 
 @router.get("/rates", response_model=List[CurrencyRateInDB])
-async def get_all_rates(db: AsyncSession = Depends(get_db)):
-    rates = await CurrencyService.get_all_rates(db)
-    return rates
+async def get_all_rates(
+        limit: Optional[int] = Query(default=None, ge=1, le=1000),
+        after: Optional[int] = Query(default=None),
+        base_currency: Optional[str] = Query(default=None),
+        target_currency: Optional[str] = Query(default=None),
+        if_none_match: Optional[str] = Header(default=None)
+):
+    snapshot = await rate_cache.get()
+    headers = {"Cache-Control": "no-cache"}
+
+    if limit is None and after is None and base_currency is None and target_currency is None:
+        body = snapshot.body
+        headers["ETag"] = snapshot.etag
+    else:
+        page = snapshot.select(
+            base_currency.upper() if base_currency else None,
+            target_currency.upper() if target_currency else None,
+            after,
+            limit
+        )
+        body = dumps(page)
+        headers["ETag"] = make_etag(body)
+        if limit is not None and len(page) == limit:
+            headers["X-Next-Cursor"] = str(page[-1]["id"])
+
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 @router.get("/rates/{rate_id}", response_model=CurrencyRateInDB)
-async def get_rate(rate_id: int, db: AsyncSession = Depends(get_db)):
-    rate = await CurrencyService.get_rate(db, rate_id)
-    if not rate:
+async def get_rate(
+        rate_id: int,
+        if_none_match: Optional[str] = Header(default=None)
+):
+    snapshot = await rate_cache.get()
+    body = snapshot.row_body(rate_id)
+    if body is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Currency rate not found"
         )
-    return rate
+
+    headers = {"ETag": make_etag(body), "Cache-Control": "no-cache"}
+
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@router.get("/rates/{pair}/history", response_model=List[RateHistoryPoint])
+async def get_rate_history(
+        pair: str,
+        response: Response,
+        start: Optional[datetime] = Query(default=None, alias="from"),
+        end: Optional[datetime] = Query(default=None, alias="to"),
+        limit: int = Query(default=1000, ge=1, le=10000),
+        after: Optional[int] = Query(default=None),
+        db: AsyncSession = Depends(get_read_db)
+):
+    try:
+        base_currency, target_currency = parse_pair(pair)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e)
+        )
+
+    points = await CurrencyService.get_rate_history(db, base_currency, target_currency, start, end, limit, after)
+    if len(points) == limit:
+        response.headers["X-Next-Cursor"] = str(points[-1].id)
+    return points
+
+
+@router.get("/convert", response_model=ConversionResult)
+async def convert(
+        base_currency: str = Query(..., alias="from"),
+        target_currency: str = Query(..., alias="to"),
+        amount: float = Query(default=1.0, gt=0)
+):
+    base_currency, target_currency = base_currency.upper(), target_currency.upper()
+    await rate_matrix.ensure()
+    rate = rate_matrix.rate(base_currency, target_currency)
+    if rate is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No conversion path between currencies"
+        )
+
+    return ConversionResult(
+        base_currency=base_currency,
+        target_currency=target_currency,
+        amount=amount,
+        rate=rate,
+        result=amount * rate
+    )
+
+
+def _check_bulk_size(items: list):
+    if not items:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Bulk request must not be empty"
+        )
+    if len(items) > settings.BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Bulk request is limited to {settings.BULK_MAX_ITEMS} items"
+        )
+
+
+async def _check_ids_exist(db: AsyncSession, rate_ids: List[int]):
+    if len(set(rate_ids)) != len(rate_ids):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Duplicate ids in request"
+        )
+
+    found = {rate.id for rate in await CurrencyService.get_rates_by_ids(db, rate_ids)}
+    missing = [rate_id for rate_id in rate_ids if rate_id not in found]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Currency rates not found: {missing}"
+        )
+
+
+@router.post("/rates/import", response_model=RateImportSummary)
+async def import_rates(
+        request: Request,
+        import_format: Optional[str] = Query(default=None, alias="format")
+):
+    import_format = import_format or format_from_content_type(request.headers.get("content-type", ""))
+    try:
+        rate_import = RateImport(import_format)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=str(e)
+        )
+
+    return await rate_import.run(request.stream())
+
+
+@router.post("/rates/bulk", response_model=List[CurrencyRateInDB], status_code=status.HTTP_201_CREATED)
+async def bulk_create_rates(items: List[CurrencyRateCreate], db: AsyncSession = Depends(get_db)):
+    _check_bulk_size(items)
+
+    pairs = [(item.base_currency, item.target_currency) for item in items]
+    if len(set(pairs)) != len(pairs):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Duplicate currency pairs in request"
+        )
+
+    existing = await CurrencyService.get_rates_by_pairs(db, pairs)
+    if existing:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Currency rate already exists: {', '.join(f'{r.base_currency}/{r.target_currency}' for r in existing)}"
+        )
+
+    rates = await CurrencyService.bulk_create_rates(db, items)
+    await publish_rate_changes([rate_to_dict(rate) for rate in rates], action="created")
+    return rates
+
+
+@router.patch("/rates/bulk", response_model=List[CurrencyRateInDB])
+async def bulk_update_rates(items: List[CurrencyRateBulkUpdate], db: AsyncSession = Depends(get_db)):
+    _check_bulk_size(items)
+    await _check_ids_exist(db, [item.id for item in items])
+
+    rates = await CurrencyService.bulk_update_rates(db, items)
+    await publish_rate_changes([rate_to_dict(rate) for rate in rates], action="updated")
+    return rates
+
+
+@router.delete("/rates/bulk", status_code=status.HTTP_204_NO_CONTENT)
+async def bulk_delete_rates(rate_ids: List[int] = Body(...), db: AsyncSession = Depends(get_db)):
+    _check_bulk_size(rate_ids)
+    await _check_ids_exist(db, rate_ids)
+
+    removed = await CurrencyService.bulk_delete_rates(db, rate_ids)
+    await publish_rate_changes([], removed=[row._asdict() for row in removed], action="deleted")
 
 
 @router.post("/rates", response_model=CurrencyRateInDB, status_code=status.HTTP_201_CREATED)
@@ -55,38 +237,7 @@ async def create_rate(rate_data: CurrencyRateCreate, db: AsyncSession = Depends(
 
     rate = await CurrencyService.create_rate(db, rate_data)
 
-    await nats_publisher.publish_currency_update(
-        "created",
-        {
-            "id": rate.id,
-            "base_currency": rate.base_currency,
-            "target_currency": rate.target_currency,
-            "rate": rate.rate,
-            "last_updated": rate.last_updated.isoformat() if rate.last_updated else None
-        }
-    )
-
-    await websocket_manager.broadcast_currency_update({
-        "id": rate.id,
-        "base_currency": rate.base_currency,
-        "target_currency": rate.target_currency,
-        "rate": float(rate.rate),
-        "last_updated": rate.last_updated.isoformat() if rate.last_updated else None,
-        "action": "created"
-    })
-
-    rates = await CurrencyService.get_all_rates(db)
-    rates_data = [
-        {
-            "id": r.id,
-            "base_currency": r.base_currency,
-            "target_currency": r.target_currency,
-            "rate": float(r.rate),
-            "last_updated": r.last_updated.isoformat() if r.last_updated else None
-        }
-        for r in rates
-    ]
-    await websocket_manager.broadcast_rates_list(rates_data)
+    await publish_rate_changes([rate_to_dict(rate)], action="created")
 
     return rate
 
@@ -97,6 +248,12 @@ async def update_rate(
         rate_data: CurrencyRateUpdate,
         db: AsyncSession = Depends(get_db)
 ):
+    if rate_data.rate is None:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Nothing to update: rate is required"
+        )
+
     rate = await CurrencyService.update_rate(db, rate_id, rate_data)
     if not rate:
         raise HTTPException(
@@ -104,38 +261,7 @@ async def update_rate(
             detail="Currency rate not found"
         )
 
-    await nats_publisher.publish_currency_update(
-        "updated",
-        {
-            "id": rate.id,
-            "base_currency": rate.base_currency,
-            "target_currency": rate.target_currency,
-            "rate": rate.rate,
-            "last_updated": rate.last_updated.isoformat() if rate.last_updated else None
-        }
-    )
-
-    await websocket_manager.broadcast_currency_update({
-        "id": rate.id,
-        "base_currency": rate.base_currency,
-        "target_currency": rate.target_currency,
-        "rate": float(rate.rate),
-        "last_updated": rate.last_updated.isoformat() if rate.last_updated else None,
-        "action": "updated"
-    })
-
-    rates = await CurrencyService.get_all_rates(db)
-    rates_data = [
-        {
-            "id": r.id,
-            "base_currency": r.base_currency,
-            "target_currency": r.target_currency,
-            "rate": float(r.rate),
-            "last_updated": r.last_updated.isoformat() if r.last_updated else None
-        }
-        for r in rates
-    ]
-    await websocket_manager.broadcast_rates_list(rates_data)
+    await publish_rate_changes([rate_to_dict(rate)], action="updated")
 
     return rate
 
@@ -156,40 +282,19 @@ async def delete_rate(rate_id: int, db: AsyncSession = Depends(get_db)):
             detail="Failed to delete currency rate"
         )
 
-    await nats_publisher.publish_currency_update(
-        "deleted",
-        {
-            "id": rate.id,
-            "base_currency": rate.base_currency,
-            "target_currency": rate.target_currency
-        }
-    )
-
-    await websocket_manager.broadcast_currency_update({
-        "id": rate.id,
-        "base_currency": rate.base_currency,
-        "target_currency": rate.target_currency,
-        "action": "deleted"
-    })
-
-    rates = await CurrencyService.get_all_rates(db)
-    rates_data = [
-        {
-            "id": r.id,
-            "base_currency": r.base_currency,
-            "target_currency": r.target_currency,
-            "rate": float(r.rate),
-            "last_updated": r.last_updated.isoformat() if r.last_updated else None
-        }
-        for r in rates
-    ]
-    await websocket_manager.broadcast_rates_list(rates_data)
+    await publish_rate_changes([], removed=[rate_to_dict(rate)], action="deleted")
 
 
 @router.get("/task-logs", response_model=List[TaskLogInDB])
-async def get_task_logs(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(
-        select(TaskLog).order_by(TaskLog.created_at.desc())
-    )
-    logs = result.scalars().all()
+async def get_task_logs(
+        response: Response,
+        limit: int = Query(default=100, ge=1, le=1000),
+        after: Optional[int] = Query(default=None),
+        task_status: Optional[str] = Query(default=None, alias="status"),
+        task_name: Optional[str] = Query(default=None),
+        db: AsyncSession = Depends(get_read_db)
+):
+    logs = await CurrencyService.get_task_logs(db, limit, after, task_status, task_name)
+    if len(logs) == limit:
+        response.headers["X-Next-Cursor"] = str(logs[-1].id)
     return logs
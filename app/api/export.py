@@ -0,0 +1,121 @@
+from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from typing import Optional
+from datetime import datetime
+
+from app.db.models import CurrencyRate, CurrencyRateHistory, TaskLog
+from app.schemas.currency import parse_pair
+from app.services.export import EXPORT_FORMATS, stream_export
+
+router = APIRouter()
+
+
+def _export_response(stmt, name: str, export_format: str, compress: bool) -> StreamingResponse:
+    filename = f"{name}.{export_format}"
+    media_type = EXPORT_FORMATS[export_format]
+    if compress:
+        filename += ".gz"
+        media_type = "application/gzip"
+
+    return StreamingResponse(
+        stream_export(stmt, export_format, compress),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "Cache-Control": "no-store"
+        }
+    )
+
+
+def _check_format(export_format: str):
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Unknown export format, expected one of: {', '.join(EXPORT_FORMATS)}"
+        )
+
+
+@router.get("/rates")
+async def export_rates(
+        export_format: str = Query(default="ndjson", alias="format"),
+        compress: bool = Query(default=False, alias="gzip"),
+        base_currency: Optional[str] = Query(default=None)
+):
+    _check_format(export_format)
+
+    stmt = select(
+        CurrencyRate.id,
+        CurrencyRate.base_currency,
+        CurrencyRate.target_currency,
+        CurrencyRate.rate,
+        CurrencyRate.last_updated
+    ).order_by(CurrencyRate.id)
+    if base_currency:
+        stmt = stmt.where(CurrencyRate.base_currency == base_currency.upper())
+
+    return _export_response(stmt, "rates", export_format, compress)
+
+
+@router.get("/rates/{pair}/history")
+async def export_rate_history(
+        pair: str,
+        export_format: str = Query(default="ndjson", alias="format"),
+        compress: bool = Query(default=False, alias="gzip"),
+        start: Optional[datetime] = Query(default=None, alias="from"),
+        end: Optional[datetime] = Query(default=None, alias="to")
+):
+    _check_format(export_format)
+    try:
+        base_currency, target_currency = parse_pair(pair)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e)
+        )
+
+    stmt = select(
+        CurrencyRateHistory.base_currency,
+        CurrencyRateHistory.target_currency,
+        CurrencyRateHistory.rate,
+        CurrencyRateHistory.recorded_at
+    ).where(
+        CurrencyRateHistory.base_currency == base_currency,
+        CurrencyRateHistory.target_currency == target_currency
+    ).order_by(CurrencyRateHistory.recorded_at)
+    if start is not None:
+        stmt = stmt.where(CurrencyRateHistory.recorded_at >= start)
+    if end is not None:
+        stmt = stmt.where(CurrencyRateHistory.recorded_at < end)
+
+    return _export_response(stmt, f"history-{base_currency}-{target_currency}", export_format, compress)
+
+
+@router.get("/task-logs")
+async def export_task_logs(
+        export_format: str = Query(default="ndjson", alias="format"),
+        compress: bool = Query(default=False, alias="gzip"),
+        task_status: Optional[str] = Query(default=None, alias="status"),
+        task_name: Optional[str] = Query(default=None),
+        start: Optional[datetime] = Query(default=None, alias="from"),
+        end: Optional[datetime] = Query(default=None, alias="to")
+):
+    _check_format(export_format)
+
+    stmt = select(
+        TaskLog.id,
+        TaskLog.task_name,
+        TaskLog.status,
+        TaskLog.details,
+        TaskLog.created_at
+    ).order_by(TaskLog.id)
+    if task_status is not None:
+        stmt = stmt.where(TaskLog.status == task_status)
+    if task_name is not None:
+        stmt = stmt.where(TaskLog.task_name == task_name)
+    if start is not None:
+        stmt = stmt.where(TaskLog.created_at >= start)
+    if end is not None:
+        stmt = stmt.where(TaskLog.created_at < end)
+
+    return _export_response(stmt, "task-logs", export_format, compress)
@@ -1,38 +1,68 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+from config import settings
 
-from app.db.database import get_db
-from app.tasks.currency_task import CurrencyUpdateTask
+from app.tasks.leader import leader_election
+from app.tasks.scheduler import scheduler
 from app.services.currency_service import CurrencyService
+from app.services.task_stats import task_stats
 
 router = APIRouter()
 
 
 @router.post("/run")
 async def run_currency_task(
-        background_tasks: BackgroundTasks,
-        db: AsyncSession = Depends(get_db)
+        wait: bool = Query(False, description="Дождаться завершения обновления")
 ):
-    task = CurrencyUpdateTask(db)
+    if scheduler.task is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Task scheduler is not running"
+        )
 
-    if task.is_running:
+    if scheduler.leader is not None and not scheduler.leader.is_leader:
         raise HTTPException(
-            status_code=400,
-            detail="Task is already running"
+            status_code=409,
+            detail={
+                "message": "Currency update runs on the leader worker",
+                "leader": await scheduler.leader.current_holder()
+            }
         )
 
-    background_tasks.add_task(task.run_task)
+    run, started = scheduler.trigger("manual")
+
+    if started:
+        CurrencyService.log_task(
+            "currency_update",
+            "manual_start",
+            "Currency update task manually triggered"
+        )
 
-    await CurrencyService.log_task(
-        db,
-        "currency_update",
-        "manual_start",
-        "Currency update task manually triggered"
-    )
+    if wait:
+        rows_changed = await scheduler.join(run)
+        return {
+            "message": "Currency update task finished",
+            "joined": not started,
+            "rows_changed": rows_changed,
+            "status": scheduler.last_status
+        }
 
-    return {"message": "Currency update task started manually"}
+    return {
+        "message": "Currency update task started manually" if started
+        else "Currency update task is already running",
+        "joined": not started
+    }
 
 
 @router.get("/status")
 async def get_task_status():
-    return {"message": "Task status endpoint"}
+    return scheduler.status()
+
+
+@router.get("/stats")
+async def get_task_stats(task_name: Optional[str] = Query(default=None)):
+    return {
+        "worker": settings.WORKER_ID,
+        "is_leader": leader_election.is_leader,
+        **task_stats.summary(task_name)
+    }
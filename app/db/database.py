@@ -1,15 +1,118 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import event, insert, inspect
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.sql import text
+from app.services.metrics import db_session_acquire_duration
 from config import settings
 from typing import AsyncGenerator
+from datetime import datetime
 import contextlib
+import logging
 
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=settings.DATABASE_ECHO,
-    future=True
-)
+logger = logging.getLogger(__name__)
+
+DATABASE_PROFILES = ("auto", "default", "sqlite", "postgresql")
+
+
+def resolve_profile(url: str, profile: str = settings.DATABASE_PROFILE) -> str:
+    if profile not in DATABASE_PROFILES:
+        raise ValueError(f"Неизвестный профиль базы данных: {profile}")
+    if profile != "auto":
+        return profile
+
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend == "sqlite" and url.database not in (None, "", ":memory:"):
+        return "sqlite"
+    if backend == "postgresql":
+        return "postgresql"
+    return "default"
+
+
+def _timed_pool(label: str) -> type:
+    class TimedQueuePool(AsyncAdaptedQueuePool):
+        def _do_get(self):
+            with db_session_acquire_duration.time(pool=label):
+                return super()._do_get()
+
+    return TimedQueuePool
+
+
+def _sqlite_pragmas(read_only: bool):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if not read_only:
+            cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT}")
+        cursor.execute(f"PRAGMA cache_size={settings.SQLITE_CACHE_SIZE}")
+        cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+    return on_connect
+
+
+def _create_sqlite_engine(url: str, pool_size: int, read_only: bool) -> AsyncEngine:
+    sqlite_engine = create_async_engine(
+        url,
+        echo=settings.DATABASE_ECHO,
+        poolclass=_timed_pool("read" if read_only else "write"),
+        pool_size=pool_size,
+        max_overflow=0,
+        pool_timeout=settings.DATABASE_POOL_TIMEOUT,
+        connect_args={"timeout": settings.SQLITE_BUSY_TIMEOUT / 1000}
+    )
+    event.listen(sqlite_engine.sync_engine, "connect", _sqlite_pragmas(read_only))
+    return sqlite_engine
+
+
+def _create_postgresql_engine(url: str, label: str) -> AsyncEngine:
+    url = make_url(url)
+    if url.drivername == "postgresql":
+        url = url.set(drivername="postgresql+asyncpg")
+    return create_async_engine(
+        url,
+        echo=settings.DATABASE_ECHO,
+        poolclass=_timed_pool(label),
+        pool_size=settings.DATABASE_POOL_SIZE,
+        max_overflow=settings.DATABASE_MAX_OVERFLOW,
+        pool_timeout=settings.DATABASE_POOL_TIMEOUT,
+        pool_recycle=settings.DATABASE_POOL_RECYCLE,
+        pool_pre_ping=True,
+        connect_args={"server_settings": {"application_name": settings.WORKER_ID}}
+    )
+
+
+def create_engines(url: str = settings.DATABASE_URL) -> tuple[str, AsyncEngine, AsyncEngine]:
+    profile = resolve_profile(url)
+
+    if profile == "sqlite":
+        return (
+            profile,
+            _create_sqlite_engine(url, settings.SQLITE_WRITE_POOL_SIZE, read_only=False),
+            _create_sqlite_engine(url, settings.SQLITE_READ_POOL_SIZE, read_only=True)
+        )
+
+    if profile == "postgresql":
+        write_engine = _create_postgresql_engine(url, "write")
+        read_engine = _create_postgresql_engine(settings.DATABASE_READ_URL, "read") \
+            if settings.DATABASE_READ_URL else write_engine
+        return profile, write_engine, read_engine
+
+    default_engine = create_async_engine(
+        url,
+        echo=settings.DATABASE_ECHO,
+        future=True
+    )
+    return profile, default_engine, default_engine
+
+
+database_profile, engine, read_engine = create_engines()
 
 AsyncSessionLocal = async_sessionmaker(
     engine,
@@ -17,21 +120,65 @@ AsyncSessionLocal = async_sessionmaker(
     expire_on_commit=False
 )
 
+ReadSessionLocal = async_sessionmaker(
+    read_engine,
+    class_=AsyncSession,
+    expire_on_commit=False
+)
+
+SnapshotSessionLocal = AsyncSessionLocal if database_profile == "postgresql" else ReadSessionLocal
+
+
+def dialect_insert(db: AsyncSession):
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert
+    return sqlite.insert
+
+
+def _has_index(connection, table_name: str, index_name: str) -> bool:
+    return index_name in {index["name"] for index in inspect(connection).get_indexes(table_name)}
+
+
+def _create_missing_indexes(connection, metadata):
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
 
 async def init_db():
     async with engine.begin() as conn:
-        from app.db.models import Base
+        from app.db.models import Base, CurrencyRate, CurrencyRateHistory
         await conn.run_sync(Base.metadata.create_all)
 
+        if not await conn.run_sync(_has_index, "currency_rates", "uq_currency_rates_pair"):
+            result = await conn.execute(text("""
+                DELETE FROM currency_rates
+                WHERE id NOT IN (
+                    SELECT MAX(id) FROM currency_rates GROUP BY base_currency, target_currency
+                )
+            """))
+            logger.warning(f"Удалено дублирующихся курсов перед созданием уникального индекса: {result.rowcount}")
+        await conn.run_sync(_create_missing_indexes, Base.metadata)
+
     async with get_db_context() as session:
-        await session.execute(text("""
-            INSERT OR IGNORE INTO currency_rates (base_currency, target_currency, rate) 
-            VALUES 
-            ('USD', 'EUR', 0.92),
-            ('USD', 'RUB', 92.5),
-            ('USD', 'JPY', 149.3)
-        """))
-        await session.commit()
+        upsert = dialect_insert(session)
+        result = await session.execute(
+            upsert(CurrencyRate)
+            .values([
+                {"base_currency": "USD", "target_currency": "EUR", "rate": 0.92},
+                {"base_currency": "USD", "target_currency": "RUB", "rate": 92.5},
+                {"base_currency": "USD", "target_currency": "JPY", "rate": 149.3}
+            ])
+            .on_conflict_do_nothing(index_elements=[CurrencyRate.base_currency, CurrencyRate.target_currency])
+            .returning(CurrencyRate.base_currency, CurrencyRate.target_currency, CurrencyRate.rate)
+        )
+        seeded = result.all()
+        if seeded:
+            recorded_at = datetime.utcnow()
+            await session.execute(
+                insert(CurrencyRateHistory.__table__),
+                [{**row._asdict(), "recorded_at": recorded_at} for row in seeded]
+            )
 
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
@@ -57,3 +204,26 @@ async def get_db_context() -> AsyncGenerator[AsyncSession, None]:
             raise
         finally:
             await session.close()
+
+
+async def get_read_db() -> AsyncGenerator[AsyncSession, None]:
+    async with ReadSessionLocal() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
+
+
+@contextlib.asynccontextmanager
+async def get_read_db_context() -> AsyncGenerator[AsyncSession, None]:
+    async with ReadSessionLocal() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
+
+
+async def close_db():
+    await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime
+from sqlalchemy import Column, Integer, String, Float, DateTime, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 
@@ -7,6 +7,9 @@ Base = declarative_base()
 
 class CurrencyRate(Base):
     __tablename__ = "currency_rates"
+    __table_args__ = (
+        Index("uq_currency_rates_pair", "base_currency", "target_currency", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     base_currency = Column(String, index=True, default="USD")
@@ -15,11 +18,36 @@ class CurrencyRate(Base):
     last_updated = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
 
+class CurrencyRateHistory(Base):
+    __tablename__ = "currency_rate_history"
+    __table_args__ = (
+        Index("ix_currency_rate_history_pair_time", "base_currency", "target_currency", "recorded_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    base_currency = Column(String, nullable=False)
+    target_currency = Column(String, nullable=False)
+    rate = Column(Float, nullable=False)
+    recorded_at = Column(DateTime(timezone=True), nullable=False)
+
+
 class TaskLog(Base):
     __tablename__ = "task_logs"
+    __table_args__ = (
+        Index("ix_task_logs_status_id", "status", "id"),
+        Index("ix_task_logs_task_name_id", "task_name", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     task_name = Column(String)
     status = Column(String)
     details = Column(String)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class LeaderLease(Base):
+    __tablename__ = "leader_leases"
+
+    name = Column(String, primary_key=True)
+    holder = Column(String, nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
@@ -1,47 +1,161 @@
 import asyncio
-import json
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
 from nats.aio.client import Client as NATS
+from app.services.metrics import nats_publish_duration
+from app.services.serialization import dumps
 from config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
+RECONNECT_INTERVAL = 5
+
+
+def pair_subject(base_currency: str, target_currency: str) -> str:
+    return f"{settings.NATS_CHANNEL}.{base_currency}.{target_currency}"
+
+
+def state_subject(base_currency: str, target_currency: str) -> str:
+    return f"{settings.NATS_CHANNEL}.state.{base_currency}.{target_currency}"
+
 
 class NATSPublisher:
-    def __init__(self):
+    def __init__(
+            self,
+            batch_size: int = settings.NATS_BATCH_SIZE,
+            flush_interval: float = settings.NATS_FLUSH_INTERVAL,
+            max_pending: int = settings.NATS_MAX_PENDING
+    ):
         self.nc = NATS()
         self.is_connected = False
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.pending: OrderedDict[str, bytes] = OrderedDict()
+        self.published = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._flusher: Optional[asyncio.Task] = None
+        self._last_connect_attempt = 0.0
+
+    async def _on_disconnected(self):
+        self.is_connected = False
+        logger.warning("Соединение с NATS потеряно")
+
+    async def _on_reconnected(self):
+        self.is_connected = True
+        logger.info("Соединение с NATS восстановлено")
+        self._wakeup.set()
+
+    async def _on_closed(self):
+        self.is_connected = False
 
     async def connect(self):
+        self._last_connect_attempt = time.monotonic()
         try:
-            await self.nc.connect(servers=[settings.NATS_URL])
+            await self.nc.connect(
+                servers=[settings.NATS_URL],
+                max_reconnect_attempts=-1,
+                disconnected_cb=self._on_disconnected,
+                reconnected_cb=self._on_reconnected,
+                closed_cb=self._on_closed
+            )
             self.is_connected = True
             logger.info(f"Подключено к NATS по адресу {settings.NATS_URL}")
         except Exception as e:
             logger.error(f"Не удалось подключиться к NATS: {e}")
             self.is_connected = False
 
-    async def publish_currency_update(self, action: str, currency_data: dict):
-        if not self.is_connected:
-            await self.connect()
+    def start(self):
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._run_flusher())
 
-        try:
-            message = {
-                "action": action,
-                "data": currency_data,
-                "timestamp": asyncio.get_event_loop().time()
-            }
-
-            await self.nc.publish(
-                settings.NATS_CHANNEL,
-                json.dumps(message).encode()
-            )
-            logger.info(f"Опубликовано в NATS: {action} - {currency_data.get('target_currency')}")
-        except Exception as e:
-            logger.error(f"Не удалось опубликовать в NATS: {e}")
+    async def _run_flusher(self):
+        await self.connect()
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            if not self.nc.is_connected and not self.nc.is_reconnecting \
+                    and time.monotonic() - self._last_connect_attempt >= RECONNECT_INTERVAL:
+                await self.connect()
+            await self.flush()
+
+    async def publish_currency_update(self, action: str, currency_data: dict, silent: bool = False):
+        subject = (state_subject if silent else pair_subject)(
+            currency_data["base_currency"], currency_data["target_currency"]
+        )
+        message = {
+            "action": action,
+            "data": currency_data,
+            "origin": settings.WORKER_ID,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        await self._enqueue(subject, dumps(message))
+
+    async def publish_rate_changes(self, changed: list[dict], removed: list[dict], action: str, silent: bool = False):
+        for rate in changed:
+            await self.publish_currency_update(action, rate, silent)
+        for rate in removed:
+            await self.publish_currency_update("deleted", rate)
+
+    async def _enqueue(self, subject: str, payload: bytes):
+        if subject in self.pending:
+            self.coalesced += 1
+            self.pending.move_to_end(subject)
+        elif len(self.pending) >= self.max_pending:
+            if self.is_connected:
+                await self.flush()
+            if len(self.pending) >= self.max_pending:
+                self.pending.popitem(last=False)
+                self.dropped += 1
+
+        self.pending[subject] = payload
+        if len(self.pending) >= self.batch_size:
+            self._wakeup.set()
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self.pending or not self.is_connected:
+                return
+
+            batch, self.pending = self.pending, OrderedDict()
+            try:
+                with nats_publish_duration.time():
+                    for subject, payload in batch.items():
+                        await self.nc.publish(subject, payload)
+                    await self.nc.flush()
+                self.published += len(batch)
+                logger.info(f"Опубликовано в NATS: {len(batch)} обновлений")
+            except Exception as e:
+                logger.error(f"Не удалось опубликовать в NATS: {e}")
+                for subject, payload in batch.items():
+                    self.pending.setdefault(subject, payload)
+
+    def stats(self) -> dict:
+        return {
+            "connected": self.is_connected,
+            "pending": len(self.pending),
+            "published": self.published,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped
+        }
 
     async def close(self):
-        await self.nc.close()
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        await self.flush()
+        if self.nc.is_connected or self.nc.is_reconnecting:
+            await self.nc.close()
 
 
 nats_publisher = NATSPublisher()
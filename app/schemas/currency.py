@@ -1,7 +1,10 @@
-from pydantic import BaseModel, Field
-from typing import Optional
+import re
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Optional
 from datetime import datetime
 
+CURRENCY_CODE = re.compile(r"[A-Z]{3}")
+
 
 class CurrencyRateBase(BaseModel):
     base_currency: str = Field(default="USD")
@@ -10,11 +13,24 @@ class CurrencyRateBase(BaseModel):
 
 
 class CurrencyRateCreate(CurrencyRateBase):
-    pass
+    rate: float = Field(gt=0)
+
+    @field_validator("base_currency", "target_currency")
+    @classmethod
+    def normalize_currency(cls, value: str) -> str:
+        value = value.strip().upper()
+        if not CURRENCY_CODE.fullmatch(value):
+            raise ValueError("Currency code must be three letters A-Z")
+        return value
 
 
 class CurrencyRateUpdate(BaseModel):
-    rate: Optional[float] = None
+    rate: Optional[float] = Field(default=None, gt=0)
+
+
+class CurrencyRateBulkUpdate(BaseModel):
+    id: int
+    rate: float = Field(gt=0)
 
 
 class CurrencyRateInDB(CurrencyRateBase):
@@ -25,6 +41,14 @@ class CurrencyRateInDB(CurrencyRateBase):
         from_attributes = True
 
 
+class ConversionResult(BaseModel):
+    base_currency: str
+    target_currency: str
+    amount: float
+    rate: float
+    result: float
+
+
 class TaskLogBase(BaseModel):
     task_name: str
     status: str
@@ -37,3 +61,78 @@ class TaskLogInDB(TaskLogBase):
 
     class Config:
         from_attributes = True
+
+
+class RateHistoryPoint(BaseModel):
+    base_currency: str
+    target_currency: str
+    rate: float
+    recorded_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class RateImportError(BaseModel):
+    line: int
+    error: str
+
+
+class RateImportSummary(BaseModel):
+    format: str
+    rows: int
+    inserted: int
+    updated: int
+    unchanged: int
+    rejected: int
+    batches: int
+    duration: float
+    errors: List[RateImportError]
+
+
+class RateStatistics(BaseModel):
+    base_currency: str
+    target_currency: str
+    window: int
+    points: int
+    last: float
+    sma: float
+    ema: float
+    std: float
+    min: float
+    max: float
+    updated_at: Optional[datetime] = None
+
+
+class RateRollingSeries(BaseModel):
+    base_currency: str
+    target_currency: str
+    window: int
+    recorded_at: List[datetime]
+    rate: List[float]
+    sma: List[Optional[float]]
+    ema: List[Optional[float]]
+    std: List[Optional[float]]
+    min: List[Optional[float]]
+    max: List[Optional[float]]
+
+
+def parse_pair(value) -> tuple[str, str]:
+    if isinstance(value, (list, tuple)) and len(value) == 2:
+        base_currency, target_currency = value
+    elif isinstance(value, str):
+        for separator in ("/", "-", "_"):
+            if separator in value:
+                base_currency, _, target_currency = value.partition(separator)
+                break
+        else:
+            if len(value) != 6:
+                raise ValueError(f"Invalid currency pair: {value}")
+            base_currency, target_currency = value[:3], value[3:]
+    else:
+        raise ValueError(f"Invalid currency pair: {value}")
+
+    if not isinstance(base_currency, str) or not isinstance(target_currency, str) \
+            or not base_currency or not target_currency:
+        raise ValueError(f"Invalid currency pair: {value}")
+    return base_currency.upper(), target_currency.upper()
@@ -0,0 +1,293 @@
+import math
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Optional
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.services.currency_service import CurrencyService
+from config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def parse_windows(value: str) -> list[int]:
+    return sorted({int(item) for item in value.split(",") if item.strip() and int(item) > 0})
+
+
+def ema(values: np.ndarray, window: int) -> np.ndarray:
+    alpha = 2.0 / (window + 1)
+    if alpha >= 1.0 or len(values) == 0:
+        return values.astype(float)
+
+    decay = 1.0 - alpha
+    block = max(1, int(500 / -math.log(decay)))
+    result = np.empty(len(values))
+    carry = float(values[0])
+    for start in range(0, len(values), block):
+        chunk = values[start:start + block]
+        powers = decay ** np.arange(1, len(chunk) + 1)
+        weighted = np.cumsum(chunk / powers) * powers
+        result[start:start + len(chunk)] = carry * powers + alpha * weighted
+        carry = result[start + len(chunk) - 1]
+    return result
+
+
+def window_statistics(values: np.ndarray, window: int) -> dict:
+    recent = values[-window:]
+    return {
+        "points": len(recent),
+        "sma": float(recent.mean()),
+        "ema": float(ema(values, window)[-1]),
+        "std": float(recent.std()),
+        "min": float(recent.min()),
+        "max": float(recent.max())
+    }
+
+
+def rolling_statistics(values: np.ndarray, window: int) -> dict:
+    result = {name: np.full(len(values), np.nan) for name in ("sma", "std", "min", "max")}
+    result["ema"] = ema(values, window)
+    if len(values) >= window:
+        windows = sliding_window_view(values, window)
+        result["sma"][window - 1:] = windows.mean(axis=1)
+        result["std"][window - 1:] = windows.std(axis=1)
+        result["min"][window - 1:] = windows.min(axis=1)
+        result["max"][window - 1:] = windows.max(axis=1)
+    return result
+
+
+def to_list(values: np.ndarray) -> list[Optional[float]]:
+    return [None if math.isnan(value) else value for value in values.tolist()]
+
+
+def _monotonic(values: np.ndarray, offset: int, ufunc) -> deque:
+    suffix = ufunc.accumulate(values[::-1])[::-1]
+    keep = np.ones(len(values), dtype=bool)
+    keep[:-1] = values[:-1] != suffix[1:]
+    keep[:-1] &= ufunc(values[:-1], suffix[1:]) == values[:-1]
+    positions = np.flatnonzero(keep)
+    return deque(zip((positions + offset).tolist(), values[positions].tolist()))
+
+
+class RollingWindow:
+    def __init__(self, size: int):
+        self.size = size
+        self.alpha = 2.0 / (size + 1)
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.ema: Optional[float] = None
+        self.minimums: deque = deque()
+        self.maximums: deque = deque()
+
+    def seed(self, values: np.ndarray, count: int):
+        recent = values[-self.size:]
+        self.total = float(recent.sum())
+        self.total_sq = float(np.dot(recent, recent))
+        self.ema = float(ema(values, self.size)[-1])
+        offset = count - len(recent)
+        self.minimums = _monotonic(recent, offset, np.minimum)
+        self.maximums = _monotonic(recent, offset, np.maximum)
+
+    def resync(self, values: np.ndarray):
+        recent = values[-self.size:]
+        self.total = float(recent.sum())
+        self.total_sq = float(np.dot(recent, recent))
+
+    def push(self, position: int, value: float, evicted: Optional[float]):
+        self.total += value
+        self.total_sq += value * value
+        if evicted is not None:
+            self.total -= evicted
+            self.total_sq -= evicted * evicted
+        self.ema = value if self.ema is None else self.ema + self.alpha * (value - self.ema)
+
+        while self.minimums and self.minimums[-1][1] >= value:
+            self.minimums.pop()
+        self.minimums.append((position, value))
+        while self.maximums and self.maximums[-1][1] <= value:
+            self.maximums.pop()
+        self.maximums.append((position, value))
+
+        expired = position - self.size
+        if self.minimums[0][0] <= expired:
+            self.minimums.popleft()
+        if self.maximums[0][0] <= expired:
+            self.maximums.popleft()
+
+    def statistics(self, count: int) -> dict:
+        points = min(count, self.size)
+        sma = self.total / points
+        return {
+            "points": points,
+            "sma": sma,
+            "ema": self.ema,
+            "std": math.sqrt(max(self.total_sq / points - sma * sma, 0.0)),
+            "min": self.minimums[0][1],
+            "max": self.maximums[0][1]
+        }
+
+
+class PairSeries:
+    def __init__(self, values: np.ndarray, updated_at: Optional[datetime], capacity: int, windows: list[int]):
+        self.capacity = capacity
+        self.buffer = np.empty(capacity)
+        values = values[-capacity:]
+        self.buffer[:len(values)] = values
+        self.count = len(values)
+        self.updated_at = updated_at
+        self.windows = {size: RollingWindow(size) for size in windows if size <= capacity}
+        if self.count:
+            for window in self.windows.values():
+                window.seed(values, self.count)
+
+    def values(self) -> np.ndarray:
+        if self.count <= self.capacity:
+            return self.buffer[:self.count]
+        start = self.count % self.capacity
+        return np.concatenate((self.buffer[start:], self.buffer[:start]))
+
+    def push(self, value: float, updated_at: Optional[datetime]):
+        position = self.count
+        for window in self.windows.values():
+            evicted = self.buffer[(position - window.size) % self.capacity] \
+                if position >= window.size else None
+            window.push(position, value, None if evicted is None else float(evicted))
+        self.buffer[position % self.capacity] = value
+        self.count += 1
+        self.updated_at = updated_at
+        if self.count % self.capacity == 0:
+            values = self.values()
+            for window in self.windows.values():
+                window.resync(values)
+
+    def statistics(self, window: int) -> dict:
+        incremental = self.windows.get(window)
+        if incremental is not None:
+            return incremental.statistics(self.count)
+        return window_statistics(self.values(), window)
+
+
+class RateAnalytics:
+    def __init__(
+            self,
+            capacity: int = settings.ANALYTICS_MAX_POINTS,
+            windows: Optional[list[int]] = None,
+            max_pairs: int = settings.ANALYTICS_MAX_PAIRS
+    ):
+        self.capacity = capacity
+        self.windows = windows if windows is not None else parse_windows(settings.ANALYTICS_WINDOWS)
+        self.max_pairs = max_pairs
+        self.series: OrderedDict[tuple[str, str], PairSeries] = OrderedDict()
+        self.versions: dict[tuple[str, str], int] = {}
+        self.loads = 0
+        self.incremental_updates = 0
+
+    def apply_changes(self, changed: list[dict], removed: Optional[list[dict]] = None):
+        for rate in changed:
+            pair = (rate["base_currency"], rate["target_currency"])
+            self.versions[pair] = self.versions.get(pair, 0) + 1
+            series = self.series.get(pair)
+            if series is not None and rate["rate"] is not None:
+                series.push(float(rate["rate"]), rate.get("last_updated"))
+                self.incremental_updates += 1
+        for rate in removed or []:
+            pair = (rate["base_currency"], rate["target_currency"])
+            self.versions[pair] = self.versions.get(pair, 0) + 1
+            self.series.pop(pair, None)
+
+    def invalidate(self, rates: list[dict]):
+        for rate in rates:
+            pair = (rate["base_currency"], rate["target_currency"])
+            self.versions[pair] = self.versions.get(pair, 0) + 1
+            self.series.pop(pair, None)
+
+    def _track(self, pair: tuple[str, str], series: PairSeries):
+        self.series[pair] = series
+        self.series.move_to_end(pair)
+        while len(self.series) > self.max_pairs:
+            self.series.popitem(last=False)
+
+    async def _load(self, db: AsyncSession, pairs: list[tuple[str, str]]) -> dict[tuple[str, str], PairSeries]:
+        versions = {pair: self.versions.get(pair, 0) for pair in pairs}
+        rows = await CurrencyService.get_recent_history(db, pairs, self.capacity)
+        self.loads += 1
+
+        loaded = {}
+        if rows:
+            keys = [(row[0], row[1]) for row in rows]
+            values = np.fromiter((row[2] for row in rows), dtype=float, count=len(rows))
+            boundaries = [0] + [
+                position for position in range(1, len(keys)) if keys[position] != keys[position - 1]
+            ] + [len(keys)]
+            for start, end in zip(boundaries, boundaries[1:]):
+                pair = keys[start]
+                loaded[pair] = PairSeries(values[start:end], rows[end - 1][3], self.capacity, self.windows)
+
+        for pair, series in loaded.items():
+            if self.versions.get(pair, 0) == versions[pair]:
+                self._track(pair, series)
+        return loaded
+
+    async def statistics(self, db: AsyncSession, pairs: list[tuple[str, str]], window: int) -> list[dict]:
+        found = {}
+        missing = []
+        for pair in pairs:
+            series = self.series.get(pair)
+            if series is None:
+                missing.append(pair)
+            else:
+                self.series.move_to_end(pair)
+                found[pair] = series
+        if missing:
+            found.update(await self._load(db, missing))
+
+        result = []
+        for pair in pairs:
+            series = found.get(pair)
+            if series is None or not series.count:
+                continue
+            result.append({
+                "base_currency": pair[0],
+                "target_currency": pair[1],
+                "window": window,
+                "last": float(series.buffer[(series.count - 1) % series.capacity]),
+                "updated_at": series.updated_at,
+                **series.statistics(window)
+            })
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "tracked_pairs": len(self.series),
+            "windows": self.windows,
+            "capacity": self.capacity,
+            "loads": self.loads,
+            "incremental_updates": self.incremental_updates
+        }
+
+
+async def rolling_series(
+        db: AsyncSession,
+        base_currency: str,
+        target_currency: str,
+        window: int,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        limit: int = 1000
+) -> dict:
+    rows = await CurrencyService.get_history_values(db, base_currency, target_currency, start, end, limit)
+    values = np.fromiter((row[0] for row in rows), dtype=float, count=len(rows))
+    statistics = rolling_statistics(values, window)
+    return {
+        "base_currency": base_currency,
+        "target_currency": target_currency,
+        "window": window,
+        "recorded_at": [row[1] for row in rows],
+        "rate": values.tolist(),
+        **{name: to_list(series) for name, series in statistics.items()}
+    }
+
+
+rate_analytics = RateAnalytics()
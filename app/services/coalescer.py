@@ -0,0 +1,156 @@
+import asyncio
+from collections import OrderedDict
+from typing import Optional
+from app.nats.publisher import nats_publisher
+from app.schemas.currency import parse_pair
+from app.services.rate_cache import rate_cache
+from app.services.serialization import dumps, rates_delta_message
+from app.websocket.currency_ws import websocket_manager
+from config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def parse_thresholds(value: str) -> dict[tuple[str, str], float]:
+    thresholds = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        pair, _, threshold = item.partition("=")
+        try:
+            thresholds[parse_pair(pair.strip())] = float(threshold)
+        except ValueError:
+            logger.error(f"Некорректный порог изменения курса: {item}")
+    return thresholds
+
+
+class UpdateCoalescer:
+    def __init__(
+            self,
+            window: float = settings.COALESCE_WINDOW,
+            threshold: float = settings.COALESCE_THRESHOLD,
+            pair_thresholds: Optional[dict[tuple[str, str], float]] = None
+    ):
+        self.window = window
+        self.threshold = threshold
+        self.pair_thresholds = pair_thresholds if pair_thresholds is not None \
+            else parse_thresholds(settings.COALESCE_PAIR_THRESHOLDS)
+        self.changed: OrderedDict[tuple[str, str], tuple[str, dict]] = OrderedDict()
+        self.removed: OrderedDict[tuple[str, str], dict] = OrderedDict()
+        self.published: dict[tuple[str, str], float] = {}
+        self.submitted = 0
+        self.merged = 0
+        self.suppressed = 0
+        self.emitted = 0
+        self.flushes = 0
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def threshold_for(self, pair: tuple[str, str]) -> float:
+        return self.pair_thresholds.get(pair, self.threshold)
+
+    async def submit(self, changed: list[dict], removed: list[dict], action: str):
+        for rate in changed:
+            pair = (rate["base_currency"], rate["target_currency"])
+            previous = self.changed.get(pair)
+            if previous is not None:
+                self.merged += 1
+                if previous[0] == "created":
+                    action_for_pair = "created"
+                else:
+                    action_for_pair = action
+            else:
+                action_for_pair = action
+            self.changed[pair] = (action_for_pair, rate)
+
+        for rate in removed:
+            pair = (rate["base_currency"], rate["target_currency"])
+            previous = self.changed.pop(pair, None)
+            if previous is not None:
+                self.merged += 1
+                if previous[0] == "created":
+                    continue
+            self.removed[pair] = rate
+
+        self.submitted += len(changed) + len(removed)
+        if self.window <= 0 or self._task is None:
+            await self.flush()
+        else:
+            self._wakeup.set()
+
+    def _passes_threshold(self, pair: tuple[str, str], rate: dict) -> bool:
+        last = self.published.get(pair)
+        threshold = self.threshold_for(pair)
+        if last is None or threshold <= 0 or not last:
+            return True
+        return abs(float(rate["rate"]) - last) / abs(last) >= threshold
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self.changed and not self.removed:
+                return
+            changed, self.changed = self.changed, OrderedDict()
+            removed, self.removed = self.removed, OrderedDict()
+
+            by_action: dict[str, list[dict]] = {}
+            suppressed = []
+            for pair, (action, rate) in changed.items():
+                if action == "updated" and not self._passes_threshold(pair, rate):
+                    suppressed.append(rate)
+                    continue
+                by_action.setdefault(action, []).append(rate)
+
+            if removed:
+                for pair in removed:
+                    self.published.pop(pair, None)
+                await self._emit([], list(removed.values()), "deleted")
+            for action, rates in by_action.items():
+                for rate in rates:
+                    self.published[(rate["base_currency"], rate["target_currency"])] = float(rate["rate"])
+                await self._emit(rates, [], action)
+            if suppressed:
+                self.suppressed += len(suppressed)
+                await nats_publisher.publish_rate_changes(suppressed, [], "updated", silent=True)
+            self.flushes += 1
+
+    async def _emit(self, changed: list[dict], removed: list[dict], action: str):
+        self.emitted += len(changed) + len(removed)
+        frame = dumps(rates_delta_message(changed, removed, action, rate_cache.version))
+        await websocket_manager.broadcast_rate_changes(changed, removed, action, frame=frame)
+        await nats_publisher.publish_rate_changes(changed, removed, action)
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            await asyncio.sleep(self.window)
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Ошибка при рассылке накопленных обновлений: {e}")
+
+    def start(self):
+        if self._task is None and self.window > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "window": self.window,
+            "pending": len(self.changed) + len(self.removed),
+            "submitted": self.submitted,
+            "merged": self.merged,
+            "suppressed": self.suppressed,
+            "emitted": self.emitted,
+            "flushes": self.flushes
+        }
+
+
+rate_coalescer = UpdateCoalescer()
@@ -0,0 +1,148 @@
+import asyncio
+from collections import deque
+from typing import Optional
+import numpy as np
+from app.services.rate_cache import rate_cache
+from config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RateMatrix:
+    def __init__(self, pivot: str = settings.CONVERSION_PIVOT):
+        self.pivot = pivot
+        self.index: dict[str, int] = {}
+        self.values = np.empty(0)
+        self.components = np.empty(0, dtype=np.int64)
+        self.matrix = np.empty((0, 0))
+        self.edges: dict[tuple[str, str], float] = {}
+        self.adjacent: dict[str, set[tuple[str, str]]] = {}
+        self.parent: dict[str, tuple[str, str]] = {}
+        self.children: dict[str, int] = {}
+        self.dirty = True
+        self._lock = asyncio.Lock()
+
+    async def ensure(self):
+        if not self.dirty:
+            return
+        async with self._lock:
+            if not self.dirty:
+                return
+            snapshot = await rate_cache.get()
+            self.build(snapshot.rates)
+
+    def build(self, rates: list[dict]):
+        latest: dict[tuple[str, str], dict] = {}
+        for rate in rates:
+            if not rate["rate"]:
+                continue
+            key = tuple(sorted((rate["base_currency"], rate["target_currency"])))
+            current = latest.get(key)
+            if current is None or (rate["last_updated"] or "", rate["id"]) > (current["last_updated"] or "", current["id"]):
+                latest[key] = rate
+
+        self.edges = {}
+        self.adjacent = {}
+        for rate in latest.values():
+            pair = (rate["base_currency"], rate["target_currency"])
+            self.edges[pair] = float(rate["rate"])
+            self.adjacent.setdefault(pair[0], set()).add(pair)
+            self.adjacent.setdefault(pair[1], set()).add(pair)
+
+        currencies = sorted(self.adjacent)
+        self.index = {currency: position for position, currency in enumerate(currencies)}
+        values = np.ones(len(currencies))
+        components = np.full(len(currencies), -1, dtype=np.int64)
+        self.parent = {}
+        self.children = {currency: 0 for currency in currencies}
+
+        roots = ([self.pivot] if self.pivot in self.index else []) + currencies
+        component = 0
+        for root in roots:
+            if components[self.index[root]] != -1:
+                continue
+            components[self.index[root]] = component
+            queue = deque([root])
+            while queue:
+                currency = queue.popleft()
+                position = self.index[currency]
+                for pair in self.adjacent[currency]:
+                    other = pair[1] if pair[0] == currency else pair[0]
+                    other_position = self.index[other]
+                    if components[other_position] != -1:
+                        continue
+                    rate = self.edges[pair]
+                    values[other_position] = values[position] * rate if pair[0] == currency \
+                        else values[position] / rate
+                    components[other_position] = component
+                    self.parent[other] = pair
+                    self.children[currency] += 1
+                    queue.append(other)
+            component += 1
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            matrix = np.outer(1.0 / values, values)
+        matrix[components[:, None] != components[None, :]] = np.nan
+
+        self.values = values
+        self.components = components
+        self.matrix = matrix
+        for pair in self.edges:
+            self._apply_direct(pair)
+        self.dirty = False
+        logger.info(f"Матрица кросс-курсов перестроена: {len(currencies)} валют, {component} компонент")
+
+    def _apply_direct(self, pair: tuple[str, str]):
+        rate = self.edges[pair]
+        base_position, target_position = self.index[pair[0]], self.index[pair[1]]
+        self.matrix[base_position, target_position] = rate
+        self.matrix[target_position, base_position] = 1.0 / rate
+
+    def apply_changes(self, changed: list[dict], removed: Optional[list[dict]] = None):
+        if self.dirty:
+            return
+        if removed:
+            self.dirty = True
+            return
+
+        for rate in changed:
+            pair = (rate["base_currency"], rate["target_currency"])
+            if pair not in self.edges or (pair[1], pair[0]) in self.edges or not rate["rate"]:
+                self.dirty = True
+                return
+
+            self.edges[pair] = float(rate["rate"])
+            base_currency, target_currency = pair
+
+            if self.parent.get(target_currency) == pair and self.children[target_currency] == 0:
+                self._move_leaf(target_currency, self.values[self.index[base_currency]] * self.edges[pair])
+            elif self.parent.get(base_currency) == pair and self.children[base_currency] == 0:
+                self._move_leaf(base_currency, self.values[self.index[target_currency]] / self.edges[pair])
+            elif self.parent.get(target_currency) == pair or self.parent.get(base_currency) == pair:
+                self.dirty = True
+                return
+            else:
+                self._apply_direct(pair)
+
+    def _move_leaf(self, currency: str, value: float):
+        position = self.index[currency]
+        self.values[position] = value
+        same_component = self.components == self.components[position]
+        self.matrix[position, same_component] = self.values[same_component] / value
+        self.matrix[same_component, position] = value / self.values[same_component]
+        for pair in self.adjacent[currency]:
+            self._apply_direct(pair)
+
+    def rate(self, base_currency: str, target_currency: str) -> Optional[float]:
+        base_position = self.index.get(base_currency)
+        target_position = self.index.get(target_currency)
+        if base_position is None or target_position is None:
+            return None
+        rate = self.matrix[base_position, target_position]
+        if np.isnan(rate):
+            return None
+        return float(rate)
+
+
+rate_matrix = RateMatrix()
@@ -1,13 +1,21 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete
+from sqlalchemy import select, insert, update, delete, tuple_, union_all
 from sqlalchemy.exc import SQLAlchemyError
-from app.db.models import CurrencyRate, TaskLog
-from app.schemas.currency import CurrencyRateCreate, CurrencyRateUpdate
+from app.db.database import dialect_insert
+from app.db.models import CurrencyRate, CurrencyRateHistory, TaskLog
+from app.schemas.currency import CurrencyRateCreate, CurrencyRateUpdate, CurrencyRateBulkUpdate
+from app.services.rate_cache import rate_cache
+from app.services.task_log_writer import task_log_writer
+from app.services.task_stats import task_stats
 from typing import List, Optional
+from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
 
+UPSERT_CHUNK_SIZE = 1000
+HISTORY_UNION_SIZE = 100
+
 
 class CurrencyService:
     @staticmethod
@@ -26,24 +34,32 @@ class CurrencyService:
     async def create_rate(db: AsyncSession, rate_data: CurrencyRateCreate) -> CurrencyRate:
         db_rate = CurrencyRate(**rate_data.dict())
         db.add(db_rate)
+        db.add(CurrencyRateHistory(**rate_data.dict(), recorded_at=datetime.utcnow()))
         await db.commit()
+        rate_cache.invalidate()
         await db.refresh(db_rate)
         return db_rate
 
     @staticmethod
     async def update_rate(db: AsyncSession, rate_id: int, rate_data: CurrencyRateUpdate) -> Optional[CurrencyRate]:
         try:
+            values = rate_data.dict(exclude_unset=True)
             await db.execute(
                 update(CurrencyRate)
                 .where(CurrencyRate.id == rate_id)
-                .values(**rate_data.dict(exclude_unset=True))
+                .values(**values)
             )
-            await db.commit()
 
             result = await db.execute(
                 select(CurrencyRate).where(CurrencyRate.id == rate_id)
             )
-            return result.scalar_one_or_none()
+            rate = result.scalar_one_or_none()
+            if rate is not None and "rate" in values:
+                await CurrencyService.record_history(db, [rate])
+
+            await db.commit()
+            rate_cache.invalidate()
+            return rate
         except SQLAlchemyError as e:
             logger.error(f"Ошибка при обновлении курса: {e}")
             await db.rollback()
@@ -56,6 +72,7 @@ class CurrencyService:
                 delete(CurrencyRate).where(CurrencyRate.id == rate_id)
             )
             await db.commit()
+            rate_cache.invalidate()
             return True
         except SQLAlchemyError as e:
             logger.error(f"Ошибка при удалении курса: {e}")
@@ -63,11 +80,251 @@ class CurrencyService:
             return False
 
     @staticmethod
-    async def log_task(db: AsyncSession, task_name: str, status: str, details: str):
-        task_log = TaskLog(
-            task_name=task_name,
-            status=status,
-            details=details
+    async def bulk_create_rates(db: AsyncSession, items: List[CurrencyRateCreate]) -> List[CurrencyRate]:
+        now = datetime.utcnow()
+        result = await db.execute(
+            insert(CurrencyRate).returning(CurrencyRate),
+            [{**item.dict(), "last_updated": now} for item in items]
+        )
+        rates = result.scalars().all()
+        await CurrencyService.record_history(db, rates, now)
+        await db.commit()
+        rate_cache.invalidate()
+        return rates
+
+    @staticmethod
+    async def bulk_update_rates(db: AsyncSession, items: List[CurrencyRateBulkUpdate]) -> List[CurrencyRate]:
+        now = datetime.utcnow()
+        await db.execute(
+            update(CurrencyRate),
+            [{"id": item.id, "rate": item.rate, "last_updated": now} for item in items]
         )
-        db.add(task_log)
+        result = await db.execute(
+            select(CurrencyRate)
+            .where(CurrencyRate.id.in_([item.id for item in items]))
+            .execution_options(populate_existing=True)
+        )
+        rates = result.scalars().all()
+        await CurrencyService.record_history(db, rates, now)
+        await db.commit()
+        rate_cache.invalidate()
+        return rates
+
+    @staticmethod
+    async def bulk_delete_rates(db: AsyncSession, rate_ids: List[int]) -> list:
+        result = await db.execute(
+            delete(CurrencyRate)
+            .where(CurrencyRate.id.in_(rate_ids))
+            .returning(CurrencyRate.id, CurrencyRate.base_currency, CurrencyRate.target_currency)
+        )
+        removed = result.all()
+        await db.commit()
+        rate_cache.invalidate()
+        return removed
+
+    @staticmethod
+    async def get_rates_by_ids(db: AsyncSession, rate_ids: List[int]) -> List[CurrencyRate]:
+        result = await db.execute(select(CurrencyRate).where(CurrencyRate.id.in_(rate_ids)))
+        return result.scalars().all()
+
+    @staticmethod
+    async def get_rates_by_pairs(db: AsyncSession, pairs: List[tuple]) -> List[CurrencyRate]:
+        result = await db.execute(
+            select(CurrencyRate).where(
+                tuple_(CurrencyRate.base_currency, CurrencyRate.target_currency).in_(pairs)
+            )
+        )
+        return result.scalars().all()
+
+    @staticmethod
+    async def _upsert(db: AsyncSession, rows: List[dict]) -> list:
+        if not rows:
+            return []
+
+        table = CurrencyRate.__table__
+        stmt = dialect_insert(db)(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.base_currency, table.c.target_currency],
+            set_={
+                "rate": stmt.excluded.rate,
+                "last_updated": stmt.excluded.last_updated
+            },
+            where=table.c.rate != stmt.excluded.rate
+        ).returning(*table.c)
+
+        result = await db.execute(stmt, rows)
+        return result.all()
+
+    @staticmethod
+    async def upsert_rates(db: AsyncSession, base_currency: str, rates: dict) -> list:
+        now = datetime.utcnow()
+        changed = await CurrencyService._upsert(db, [
+            {
+                "base_currency": base_currency,
+                "target_currency": target_currency,
+                "rate": float(rate),
+                "last_updated": now
+            }
+            for target_currency, rate in rates.items()
+            if float(rate) > 0
+        ])
+
+        await CurrencyService.record_history(db, changed, now)
         await db.commit()
+        if changed:
+            rate_cache.invalidate()
+        return changed
+
+    @staticmethod
+    async def import_rates(db: AsyncSession, items: List[CurrencyRateCreate]) -> tuple[list, list]:
+        now = datetime.utcnow()
+        rows = list({
+            (item.base_currency, item.target_currency): {
+                **item.model_dump(),
+                "last_updated": now
+            }
+            for item in items
+        }.values())
+
+        existing = set()
+        for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+            chunk = rows[start:start + UPSERT_CHUNK_SIZE]
+            result = await db.execute(
+                select(CurrencyRate.base_currency, CurrencyRate.target_currency).where(
+                    CurrencyRate.base_currency.in_({row["base_currency"] for row in chunk}),
+                    CurrencyRate.target_currency.in_({row["target_currency"] for row in chunk})
+                )
+            )
+            existing.update(result.tuples().all())
+
+        inserted, updated = [], []
+        for rate in await CurrencyService._upsert(db, rows):
+            if (rate.base_currency, rate.target_currency) in existing:
+                updated.append(rate)
+            else:
+                inserted.append(rate)
+
+        await CurrencyService.record_history(db, inserted + updated, now)
+        await db.commit()
+        if inserted or updated:
+            rate_cache.invalidate()
+        return inserted, updated
+
+    @staticmethod
+    async def record_history(db: AsyncSession, rates: List[CurrencyRate], recorded_at: Optional[datetime] = None):
+        if not rates:
+            return
+        recorded_at = recorded_at or datetime.utcnow()
+        await db.execute(
+            insert(CurrencyRateHistory.__table__),
+            [
+                {
+                    "base_currency": rate.base_currency,
+                    "target_currency": rate.target_currency,
+                    "rate": rate.rate,
+                    "recorded_at": recorded_at
+                }
+                for rate in rates
+            ]
+        )
+
+    @staticmethod
+    async def get_rate_history(
+            db: AsyncSession,
+            base_currency: str,
+            target_currency: str,
+            start: Optional[datetime] = None,
+            end: Optional[datetime] = None,
+            limit: int = 1000,
+            after: Optional[int] = None
+    ) -> List[CurrencyRateHistory]:
+        stmt = select(CurrencyRateHistory).where(
+            CurrencyRateHistory.base_currency == base_currency,
+            CurrencyRateHistory.target_currency == target_currency
+        )
+        if start is not None:
+            stmt = stmt.where(CurrencyRateHistory.recorded_at >= start)
+        if end is not None:
+            stmt = stmt.where(CurrencyRateHistory.recorded_at < end)
+        if after is not None:
+            after_recorded_at = select(CurrencyRateHistory.recorded_at) \
+                .where(CurrencyRateHistory.id == after).scalar_subquery()
+            stmt = stmt.where(
+                (CurrencyRateHistory.recorded_at > after_recorded_at) |
+                ((CurrencyRateHistory.recorded_at == after_recorded_at) & (CurrencyRateHistory.id > after))
+            )
+
+        result = await db.execute(
+            stmt.order_by(CurrencyRateHistory.recorded_at, CurrencyRateHistory.id).limit(limit)
+        )
+        return result.scalars().all()
+
+    @staticmethod
+    async def get_history_values(
+            db: AsyncSession,
+            base_currency: str,
+            target_currency: str,
+            start: Optional[datetime] = None,
+            end: Optional[datetime] = None,
+            limit: int = 1000
+    ) -> list:
+        stmt = select(CurrencyRateHistory.rate, CurrencyRateHistory.recorded_at).where(
+            CurrencyRateHistory.base_currency == base_currency,
+            CurrencyRateHistory.target_currency == target_currency
+        )
+        if start is not None:
+            stmt = stmt.where(CurrencyRateHistory.recorded_at >= start)
+        if end is not None:
+            stmt = stmt.where(CurrencyRateHistory.recorded_at < end)
+
+        result = await db.execute(stmt.order_by(CurrencyRateHistory.recorded_at.desc()).limit(limit))
+        return result.all()[::-1]
+
+    @staticmethod
+    async def get_recent_history(db: AsyncSession, pairs: List[tuple], limit: int) -> list:
+        pairs = list(dict.fromkeys(pairs))
+        rows = []
+        for start in range(0, len(pairs), HISTORY_UNION_SIZE):
+            recent = union_all(*[
+                select(
+                    select(
+                        CurrencyRateHistory.base_currency,
+                        CurrencyRateHistory.target_currency,
+                        CurrencyRateHistory.rate,
+                        CurrencyRateHistory.recorded_at
+                    ).where(
+                        CurrencyRateHistory.base_currency == base_currency,
+                        CurrencyRateHistory.target_currency == target_currency
+                    ).order_by(CurrencyRateHistory.recorded_at.desc()).limit(limit).subquery()
+                )
+                for base_currency, target_currency in pairs[start:start + HISTORY_UNION_SIZE]
+            ]).subquery()
+            result = await db.execute(
+                select(recent).order_by(recent.c.base_currency, recent.c.target_currency, recent.c.recorded_at)
+            )
+            rows.extend(result.tuples().all())
+        return rows
+
+    @staticmethod
+    async def get_task_logs(
+            db: AsyncSession,
+            limit: int = 100,
+            after: Optional[int] = None,
+            status: Optional[str] = None,
+            task_name: Optional[str] = None
+    ) -> List[TaskLog]:
+        stmt = select(TaskLog)
+        if after is not None:
+            stmt = stmt.where(TaskLog.id < after)
+        if status is not None:
+            stmt = stmt.where(TaskLog.status == status)
+        if task_name is not None:
+            stmt = stmt.where(TaskLog.task_name == task_name)
+
+        result = await db.execute(stmt.order_by(TaskLog.id.desc()).limit(limit))
+        return result.scalars().all()
+
+    @staticmethod
+    def log_task(task_name: str, status: str, details: str):
+        task_log_writer.log(task_name, status, details)
+        task_stats.record_status(task_name, status)
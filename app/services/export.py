@@ -0,0 +1,76 @@
+import csv
+import io
+import zlib
+from datetime import datetime
+from typing import AsyncIterator
+from sqlalchemy.sql import Select
+from app.db.database import get_read_db_context
+from app.services.serialization import dumps
+from config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv"
+}
+
+
+def _plain(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _encode_ndjson(columns: list[str], rows) -> bytes:
+    return b"".join(
+        dumps({column: _plain(value) for column, value in zip(columns, row)}) + b"\n"
+        for row in rows
+    )
+
+
+def _encode_csv(rows) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([_plain(value) for value in row] for row in rows)
+    return buffer.getvalue().encode()
+
+
+async def _stream_chunks(
+        stmt: Select,
+        export_format: str,
+        chunk_size: int
+) -> AsyncIterator[bytes]:
+    columns = [column.key for column in stmt.selected_columns]
+    if export_format == "csv":
+        yield _encode_csv([columns])
+
+    exported = 0
+    async with get_read_db_context() as db:
+        result = await db.stream(stmt.execution_options(yield_per=chunk_size))
+        async for rows in result.partitions(chunk_size):
+            exported += len(rows)
+            if export_format == "csv":
+                yield _encode_csv(rows)
+            else:
+                yield _encode_ndjson(columns, rows)
+
+    logger.info(f"Экспорт завершён: {exported} строк")
+
+
+async def stream_export(
+        stmt: Select,
+        export_format: str,
+        compress: bool = False,
+        chunk_size: int = settings.EXPORT_CHUNK_SIZE
+) -> AsyncIterator[bytes]:
+    if not compress:
+        async for chunk in _stream_chunks(stmt, export_format, chunk_size):
+            yield chunk
+        return
+
+    compressor = zlib.compressobj(settings.EXPORT_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    async for chunk in _stream_chunks(stmt, export_format, chunk_size):
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
@@ -0,0 +1,118 @@
+import asyncio
+import bisect
+import hashlib
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import select
+from app.db.database import SnapshotSessionLocal
+from app.db.models import CurrencyRate
+from app.services.serialization import dumps, rate_to_dict
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def make_etag(body: bytes) -> str:
+    return f'"{hashlib.sha1(body).hexdigest()}"'
+
+
+class RateSnapshot:
+    def __init__(self, version: int, rates: list[dict]):
+        self.version = version
+        self.rates = rates
+        self.by_id = {rate["id"]: rate for rate in rates}
+        self.body = dumps(rates)
+        self.etag = make_etag(self.body)
+        self._row_bodies: dict[int, bytes] = {}
+        self._frames: dict[tuple, str] = {}
+        self._by_base: Optional[dict[str, list[dict]]] = None
+
+    def get(self, rate_id: int) -> Optional[dict]:
+        return self.by_id.get(rate_id)
+
+    def select(
+            self,
+            base_currency: Optional[str] = None,
+            target_currency: Optional[str] = None,
+            after: Optional[int] = None,
+            limit: Optional[int] = None
+    ) -> list[dict]:
+        rates = self.rates
+        if base_currency is not None:
+            if self._by_base is None:
+                by_base: dict[str, list[dict]] = {}
+                for rate in self.rates:
+                    by_base.setdefault(rate["base_currency"], []).append(rate)
+                self._by_base = by_base
+            rates = self._by_base.get(base_currency, [])
+
+        if after is not None:
+            rates = rates[bisect.bisect_right(rates, after, key=lambda rate: rate["id"]):]
+        if target_currency is not None:
+            rates = [rate for rate in rates if rate["target_currency"] == target_currency]
+        if limit is not None:
+            rates = rates[:limit]
+        return rates
+
+    def row_body(self, rate_id: int) -> Optional[bytes]:
+        body = self._row_bodies.get(rate_id)
+        if body is None:
+            rate = self.by_id.get(rate_id)
+            if rate is None:
+                return None
+            body = self._row_bodies[rate_id] = dumps(rate)
+        return body
+
+    def frame(self, message_type: str, **fields) -> str:
+        key = (message_type, tuple(sorted(fields.items())))
+        frame = self._frames.get(key)
+        if frame is None:
+            frame = self._frames[key] = dumps({
+                "type": message_type,
+                **fields,
+                "version": self.version,
+                "data": self.rates,
+                "timestamp": datetime.utcnow().isoformat()
+            }).decode()
+        return frame
+
+
+class RateCache:
+    def __init__(self):
+        self.version = 0
+        self._snapshot: Optional[RateSnapshot] = None
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        self.version += 1
+        self._snapshot = None
+
+    async def get(self) -> RateSnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None:
+            return snapshot
+
+        async with self._lock:
+            if self._snapshot is not None:
+                return self._snapshot
+
+            version = self.version
+            async with SnapshotSessionLocal() as db:
+                result = await db.execute(select(CurrencyRate).order_by(CurrencyRate.id))
+                snapshot = RateSnapshot(version, [rate_to_dict(rate) for rate in result.scalars().all()])
+
+            if version == self.version:
+                self._snapshot = snapshot
+            logger.debug(f"Снимок курсов перестроен: версия {version}, записей {len(snapshot.rates)}")
+            return snapshot
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+
+
+rate_cache = RateCache()
@@ -0,0 +1,37 @@
+from typing import Optional
+from app.services.analytics import rate_analytics
+from app.services.coalescer import rate_coalescer
+from app.services.conversion import rate_matrix
+from app.services.rate_cache import rate_cache
+from app.websocket.currency_ws import websocket_manager
+
+
+async def publish_rate_changes(
+        changed: list[dict],
+        removed: Optional[list[dict]] = None,
+        action: str = "updated"
+):
+    removed = removed or []
+    if not changed and not removed:
+        return
+
+    rate_matrix.apply_changes(changed, removed)
+    rate_analytics.apply_changes(changed, removed)
+    await rate_coalescer.submit(changed, removed, action)
+
+
+async def apply_remote_changes(
+        changed: list[dict],
+        removed: Optional[list[dict]] = None,
+        action: str = "updated",
+        broadcast: bool = True
+):
+    removed = removed or []
+    if not changed and not removed:
+        return
+
+    rate_cache.invalidate()
+    rate_matrix.apply_changes(changed, removed)
+    rate_analytics.invalidate(changed + removed)
+    if broadcast:
+        await websocket_manager.broadcast_rate_changes(changed, removed, action)
@@ -0,0 +1,195 @@
+import codecs
+import csv
+import time
+from typing import AsyncIterator
+from pydantic import ValidationError
+from sqlalchemy.exc import SQLAlchemyError
+from app.db.database import get_db_context
+from app.schemas.currency import CurrencyRateCreate
+from app.services.currency_service import CurrencyService
+from app.services.rate_events import publish_rate_changes
+from app.services.serialization import loads, rate_to_dict
+from config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ("csv", "ndjson")
+IMPORT_CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson"
+}
+
+
+def format_from_content_type(content_type: str):
+    return IMPORT_CONTENT_TYPES.get(content_type.split(";")[0].strip().lower())
+
+
+class _RecordSplitter:
+    def __init__(self, quoted: bool):
+        self.quoted = quoted
+        self.line_number = 0
+        self.first_line = 0
+        self.quotes = 0
+        self.pending: list[str] = []
+
+    def feed(self, lines: list[str]) -> list[tuple[int, str]]:
+        records = []
+        for line in lines:
+            self.line_number += 1
+            if not self.pending:
+                self.first_line = self.line_number
+            self.pending.append(line)
+            if self.quoted:
+                self.quotes += line.count('"')
+                if self.quotes % 2:
+                    continue
+            records.append(self.take())
+        return records
+
+    def take(self) -> tuple[int, str]:
+        record = (self.first_line, "\n".join(self.pending).rstrip("\r"))
+        self.pending = []
+        self.quotes = 0
+        return record
+
+
+async def _read_records(chunks: AsyncIterator[bytes], quoted: bool) -> AsyncIterator[list[tuple[int, str]]]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    splitter = _RecordSplitter(quoted)
+    tail = ""
+    async for chunk in chunks:
+        lines = (tail + decoder.decode(chunk)).split("\n")
+        tail = lines.pop()
+        yield splitter.feed(lines)
+    tail += decoder.decode(b"", final=True)
+    records = splitter.feed([tail]) if tail else []
+    if splitter.pending:
+        records.append(splitter.take())
+    yield records
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" for item in error.errors()
+    )
+
+
+class RateImport:
+    def __init__(
+            self,
+            import_format: str,
+            batch_size: int = settings.IMPORT_BATCH_SIZE,
+            max_errors: int = settings.IMPORT_MAX_ERRORS
+    ):
+        if import_format not in IMPORT_FORMATS:
+            raise ValueError(f"Unknown import format, expected one of: {', '.join(IMPORT_FORMATS)}")
+
+        self.format = import_format
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.rejected = 0
+        self.batches = 0
+        self.errors: list[dict] = []
+        self._header = None
+
+    def _reject(self, line_number: int, message: str):
+        self.rejected += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": line_number, "error": message})
+
+    def _parse(self, batch: list[tuple[int, str]]) -> list[tuple[int, dict]]:
+        if self.format == "ndjson":
+            parsed = []
+            for line_number, line in batch:
+                try:
+                    row = loads(line)
+                except ValueError as e:
+                    self._reject(line_number, f"Invalid JSON: {e}")
+                    continue
+                if not isinstance(row, dict):
+                    self._reject(line_number, "Expected a JSON object")
+                    continue
+                parsed.append((line_number, row))
+            return parsed
+
+        if self._header is None:
+            line_number, line = batch.pop(0)
+            self._header = [column.strip() for column in next(csv.reader([line]))]
+        return [
+            (line_number, {column: value for column, value in zip(self._header, values) if value != ""})
+            for (line_number, _), values in zip(batch, csv.reader(line for _, line in batch))
+        ]
+
+    async def _write(self, batch: list[tuple[int, str]]):
+        parsed = self._parse(batch)
+        self.rows += len(batch)
+
+        items = []
+        for line_number, row in parsed:
+            try:
+                items.append(CurrencyRateCreate.model_validate(row))
+            except ValidationError as e:
+                self._reject(line_number, _validation_message(e))
+        if not items:
+            return
+
+        try:
+            async with get_db_context() as db:
+                inserted, updated = await CurrencyService.import_rates(db, items)
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка БД при импорте курсов: {e}")
+            first_line, last_line = batch[0][0], batch[-1][0]
+            self._reject(first_line, f"Database error in lines {first_line}-{last_line}")
+            self.rejected += len(items) - 1
+            return
+
+        self.batches += 1
+        self.inserted += len(inserted)
+        self.updated += len(updated)
+        if inserted:
+            await publish_rate_changes([rate_to_dict(rate) for rate in inserted], action="created")
+        if updated:
+            await publish_rate_changes([rate_to_dict(rate) for rate in updated])
+
+    async def run(self, chunks: AsyncIterator[bytes]) -> dict:
+        started = time.monotonic()
+        batch: list[tuple[int, str]] = []
+
+        async for records in _read_records(chunks, quoted=self.format == "csv"):
+            for line_number, line in records:
+                if not line.strip():
+                    continue
+                batch.append((line_number, line))
+                if len(batch) >= self.batch_size:
+                    await self._write(batch)
+                    batch = []
+        if batch:
+            await self._write(batch)
+
+        summary = self.summary(time.monotonic() - started)
+        logger.info(
+            f"Импорт курсов завершён: строк {self.rows}, добавлено {self.inserted}, "
+            f"обновлено {self.updated}, отклонено {self.rejected}"
+        )
+        return summary
+
+    def summary(self, duration: float) -> dict:
+        accepted = self.rows - self.rejected
+        return {
+            "format": self.format,
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "unchanged": max(accepted - self.inserted - self.updated, 0),
+            "rejected": self.rejected,
+            "batches": self.batches,
+            "duration": round(duration, 3),
+            "errors": self.errors
+        }
@@ -0,0 +1,189 @@
+import asyncio
+import hashlib
+import re
+import time
+from datetime import datetime
+from typing import Optional
+from urllib.parse import urlsplit
+import httpx
+from app.services.metrics import provider_fetch_duration, provider_fetch_failures
+from config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+NAMED_URL = re.compile(r"^([\w.-]+)=(\w+://.+)$")
+
+
+class ProviderError(Exception):
+    pass
+
+
+def parse_provider(value: str) -> tuple[str, str]:
+    match = NAMED_URL.match(value)
+    if match:
+        return match.group(1), match.group(2)
+    return urlsplit(value).hostname or "provider", value
+
+
+class RateProvider:
+    def __init__(self, url: str, name: Optional[str] = None):
+        self.url = url
+        self.name = name or parse_provider(url)[0]
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+        self.payload_hash: Optional[str] = None
+        self.pending_validators: Optional[tuple] = None
+        self.last_status: Optional[str] = None
+        self.last_latency: Optional[float] = None
+        self.failures = 0
+        self.unchanged = 0
+
+    def conditional_headers(self) -> dict:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def redact(self, message) -> str:
+        return str(message).replace(self.url, self.name)
+
+    @staticmethod
+    def parse(data: dict) -> dict:
+        base_currency = data.get("base_code") or data.get("base")
+        rates = data.get("conversion_rates") or data.get("rates")
+        if not base_currency or not isinstance(rates, dict):
+            raise ProviderError("Unexpected provider payload")
+        return {
+            "base_currency": base_currency,
+            "rates": rates,
+            "last_updated": datetime.utcnow().isoformat()
+        }
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "last_status": self.last_status,
+            "last_latency": self.last_latency,
+            "failures": self.failures,
+            "unchanged": self.unchanged
+        }
+
+
+class RateFetcher:
+    def __init__(
+            self,
+            urls: list[str] = settings.CURRENCY_API_URLS,
+            max_retries: int = settings.TASK_MAX_RETRIES,
+            retry_delay: float = settings.TASK_RETRY_DELAY,
+            cycle_budget: float = settings.PROVIDER_CYCLE_BUDGET
+    ):
+        self.providers = []
+        names = [parse_provider(url)[0] for url in urls]
+        for position, (url, name) in enumerate(zip(urls, names)):
+            if names.count(name) > 1:
+                name = f"{name}#{position + 1}"
+            self.providers.append(RateProvider(parse_provider(url)[1], name))
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.cycle_budget = cycle_budget
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(10.0, connect=5.0),
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10)
+            )
+        return self._client
+
+    async def fetch_all(self) -> tuple[list[dict], list[str]]:
+        deadline = time.monotonic() + self.cycle_budget
+        results = await asyncio.gather(
+            *(self._fetch(provider, deadline) for provider in self.providers),
+            return_exceptions=True
+        )
+
+        payloads, errors = [], []
+        for provider, result in zip(self.providers, results):
+            if isinstance(result, Exception):
+                provider.failures += 1
+                provider.last_status = "failed"
+                provider_fetch_failures.inc(provider=provider.name)
+                errors.append(f"{provider.name}: {provider.redact(result)}")
+                logger.error(f"Ошибка при получении курсов от {provider.name}: {provider.redact(result)}")
+            elif result is None:
+                provider.unchanged += 1
+                provider.last_status = "unchanged"
+            else:
+                provider.last_status = "success"
+                payloads.append(result)
+        return payloads, errors
+
+    async def _fetch(self, provider: RateProvider, deadline: float) -> Optional[dict]:
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise ProviderError("Cycle latency budget exhausted")
+
+            started = time.monotonic()
+            try:
+                response = await asyncio.wait_for(
+                    self.client.get(provider.url, headers=provider.conditional_headers()),
+                    timeout=remaining
+                )
+                provider.last_latency = time.monotonic() - started
+                provider_fetch_duration.observe(provider.last_latency, provider=provider.name)
+
+                if response.status_code == 304:
+                    return None
+                if response.status_code in RETRYABLE_STATUS_CODES:
+                    raise ProviderError(f"HTTP {response.status_code}")
+                response.raise_for_status()
+            except (httpx.TransportError, asyncio.TimeoutError, ProviderError) as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise ProviderError(f"{e!r} after {attempt} attempts") from e
+                delay = self.retry_delay * 2 ** (attempt - 1)
+                if time.monotonic() + delay >= deadline:
+                    raise ProviderError(f"{e!r}, no latency budget left for retry") from e
+                logger.warning(
+                    f"Повтор запроса к {provider.name} через {delay} с (попытка {attempt}): {provider.redact(repr(e))}"
+                )
+                await asyncio.sleep(delay)
+                continue
+
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+            payload_hash = hashlib.sha256(response.content).hexdigest()
+            if payload_hash == provider.payload_hash:
+                provider.etag, provider.last_modified = etag, last_modified
+                return None
+
+            payload = RateProvider.parse(response.json())
+            payload["provider"] = provider.name
+            provider.pending_validators = (etag, last_modified, payload_hash)
+            logger.info(f"Получены курсы для базовой валюты: {payload['base_currency']}")
+            return payload
+
+    def confirm(self, payload: dict):
+        for provider in self.providers:
+            if provider.name == payload.get("provider") and provider.pending_validators is not None:
+                provider.etag, provider.last_modified, provider.payload_hash = provider.pending_validators
+                provider.pending_validators = None
+
+    def stats(self) -> list[dict]:
+        return [provider.stats() for provider in self.providers]
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+rate_fetcher = RateFetcher()
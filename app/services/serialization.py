@@ -0,0 +1,54 @@
+import json
+from datetime import datetime
+from typing import Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+def loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def rate_to_dict(rate) -> dict:
+    return {
+        "id": rate.id,
+        "base_currency": rate.base_currency,
+        "target_currency": rate.target_currency,
+        "rate": float(rate.rate),
+        "last_updated": rate.last_updated.isoformat() if rate.last_updated else None
+    }
+
+
+def rate_key(rate: dict) -> dict:
+    return {
+        "id": rate.get("id"),
+        "base_currency": rate["base_currency"],
+        "target_currency": rate["target_currency"]
+    }
+
+
+def rates_delta_message(
+        changed: list[dict],
+        removed: list[dict],
+        action: str,
+        version: Optional[int] = None
+) -> dict:
+    return {
+        "type": "rates_delta",
+        "action": action,
+        "version": version,
+        "changed": changed,
+        "removed": [rate_key(rate) for rate in removed],
+        "timestamp": datetime.utcnow().isoformat()
+    }
@@ -0,0 +1,127 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import select, insert, delete
+from sqlalchemy.exc import SQLAlchemyError
+from app.db.database import get_db_context
+from app.db.models import TaskLog
+from app.tasks.leader import leader_election
+from config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TaskLogWriter:
+    def __init__(
+            self,
+            batch_size: int = settings.TASK_LOG_BATCH_SIZE,
+            flush_interval: float = settings.TASK_LOG_FLUSH_INTERVAL,
+            retention_days: int = settings.TASK_LOG_RETENTION_DAYS,
+            max_rows: int = settings.TASK_LOG_MAX_ROWS,
+            compaction_interval: int = settings.TASK_LOG_COMPACTION_INTERVAL
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention_days = retention_days
+        self.max_rows = max_rows
+        self.compaction_interval = compaction_interval
+        self.max_buffer = batch_size * 100
+        self.buffer: list[dict] = []
+        self.written = 0
+        self.dropped = 0
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._writer_task: Optional[asyncio.Task] = None
+        self._compaction_task: Optional[asyncio.Task] = None
+
+    def log(self, task_name: str, status: str, details: str):
+        self.buffer.append({
+            "task_name": task_name,
+            "status": status,
+            "details": details,
+            "created_at": datetime.utcnow()
+        })
+        self._trim()
+        if len(self.buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    def _trim(self):
+        overflow = len(self.buffer) - self.max_buffer
+        if overflow > 0:
+            del self.buffer[:overflow]
+            self.dropped += overflow
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self.buffer:
+                return
+            batch, self.buffer = self.buffer, []
+
+            try:
+                async with get_db_context() as db:
+                    await db.execute(insert(TaskLog), batch)
+                self.written += len(batch)
+            except SQLAlchemyError as e:
+                logger.error(f"Ошибка при записи логов задач: {e}")
+                self.buffer = batch + self.buffer
+                self._trim()
+
+    async def compact(self):
+        if not leader_election.is_leader:
+            return
+        try:
+            async with get_db_context() as db:
+                if self.retention_days > 0:
+                    cutoff = datetime.utcnow() - timedelta(days=self.retention_days)
+                    await db.execute(delete(TaskLog).where(TaskLog.created_at < cutoff))
+                if self.max_rows > 0:
+                    oldest_kept = (
+                        select(TaskLog.id)
+                        .order_by(TaskLog.id.desc())
+                        .offset(self.max_rows - 1)
+                        .limit(1)
+                        .scalar_subquery()
+                    )
+                    await db.execute(delete(TaskLog).where(TaskLog.id < oldest_kept))
+            logger.info("Очистка логов задач выполнена")
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при очистке логов задач: {e}")
+
+    async def _run_writer(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def _run_compaction(self):
+        while True:
+            await self.compact()
+            await asyncio.sleep(self.compaction_interval)
+
+    def start(self):
+        if self._writer_task is None:
+            self._writer_task = asyncio.create_task(self._run_writer())
+        if self._compaction_task is None and self.compaction_interval > 0:
+            self._compaction_task = asyncio.create_task(self._run_compaction())
+
+    async def stop(self):
+        for task in (self._writer_task, self._compaction_task):
+            if task is not None:
+                task.cancel()
+        self._writer_task = None
+        self._compaction_task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "buffered": len(self.buffer),
+            "written": self.written,
+            "dropped": self.dropped
+        }
+
+
+task_log_writer = TaskLogWriter()
@@ -0,0 +1,155 @@
+import time
+from bisect import bisect_left
+from collections import deque
+from typing import Optional
+from app.services.metrics import DEFAULT_BUCKETS
+
+DURATION_BUCKETS = DEFAULT_BUCKETS + (60.0, 120.0, 300.0)
+
+STATS_WINDOWS = (
+    ("1m", 60, 1),
+    ("1h", 3600, 60),
+    ("24h", 86400, 600)
+)
+
+
+class TaskCounters:
+    def __init__(self):
+        self.statuses: dict[str, int] = {}
+        self.runs = 0
+        self.rows_changed = 0
+        self.durations = [0] * (len(DURATION_BUCKETS) + 1)
+
+    def add(self, other: "TaskCounters", sign: int = 1):
+        for status, count in other.statuses.items():
+            self.statuses[status] = self.statuses.get(status, 0) + sign * count
+            if not self.statuses[status]:
+                del self.statuses[status]
+        self.runs += sign * other.runs
+        self.rows_changed += sign * other.rows_changed
+        for position, count in enumerate(other.durations):
+            self.durations[position] += sign * count
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        if not self.runs:
+            return None
+        rank = fraction * self.runs
+        cumulative = 0
+        for position, count in enumerate(self.durations):
+            if count and cumulative + count >= rank:
+                lower = DURATION_BUCKETS[position - 1] if position else 0.0
+                if position == len(DURATION_BUCKETS):
+                    return lower
+                upper = DURATION_BUCKETS[position]
+                return round(lower + (upper - lower) * (rank - cumulative) / count, 4)
+            cumulative += count
+        return None
+
+    def summary(self) -> dict:
+        success = self.statuses.get("success", 0)
+        failed = self.statuses.get("failed", 0)
+        finished = success + failed
+        return {
+            "success": success,
+            "failed": failed,
+            "error_rate": round(failed / finished, 4) if finished else 0.0,
+            "runs": self.runs,
+            "rows_changed": self.rows_changed,
+            "duration_p50": self.percentile(0.5),
+            "duration_p95": self.percentile(0.95),
+            "statuses": dict(self.statuses)
+        }
+
+
+class RollingTaskCounters:
+    def __init__(self, window: int, resolution: int):
+        self.window = window
+        self.resolution = resolution
+        self.buckets: deque[tuple[int, TaskCounters]] = deque()
+        self.totals = TaskCounters()
+
+    def _expire(self, now: float):
+        oldest = int(now // self.resolution) - self.window // self.resolution
+        while self.buckets and self.buckets[0][0] <= oldest:
+            _, counters = self.buckets.popleft()
+            self.totals.add(counters, -1)
+
+    def _current(self, now: float) -> TaskCounters:
+        self._expire(now)
+        slot = int(now // self.resolution)
+        if not self.buckets or self.buckets[-1][0] != slot:
+            self.buckets.append((slot, TaskCounters()))
+        return self.buckets[-1][1]
+
+    def record_status(self, status: str, now: float):
+        bucket = self._current(now)
+        bucket.statuses[status] = bucket.statuses.get(status, 0) + 1
+        self.totals.statuses[status] = self.totals.statuses.get(status, 0) + 1
+
+    def record_run(self, duration: float, rows_changed: int, now: float):
+        bucket = self._current(now)
+        position = bisect_left(DURATION_BUCKETS, duration)
+        for counters in (bucket, self.totals):
+            counters.runs += 1
+            counters.rows_changed += rows_changed
+            counters.durations[position] += 1
+
+    def summary(self, now: float) -> dict:
+        self._expire(now)
+        return self.totals.summary()
+
+
+class TaskRunStats:
+    def __init__(self, windows: tuple = STATS_WINDOWS):
+        self.windows = {name: RollingTaskCounters(window, resolution) for name, window, resolution in windows}
+        self.since_start = TaskCounters()
+
+    def record_status(self, status: str, now: float):
+        for counters in self.windows.values():
+            counters.record_status(status, now)
+        self.since_start.statuses[status] = self.since_start.statuses.get(status, 0) + 1
+
+    def record_run(self, duration: float, rows_changed: int, now: float):
+        for counters in self.windows.values():
+            counters.record_run(duration, rows_changed, now)
+        self.since_start.runs += 1
+        self.since_start.rows_changed += rows_changed
+        self.since_start.durations[bisect_left(DURATION_BUCKETS, duration)] += 1
+
+    def summary(self, now: float) -> dict:
+        return {
+            "windows": {name: counters.summary(now) for name, counters in self.windows.items()},
+            "since_start": self.since_start.summary()
+        }
+
+
+class TaskStats:
+    def __init__(self):
+        self.tasks: dict[str, TaskRunStats] = {}
+        self.started_at = time.time()
+
+    def _task(self, task_name: str) -> TaskRunStats:
+        stats = self.tasks.get(task_name)
+        if stats is None:
+            stats = self.tasks[task_name] = TaskRunStats()
+        return stats
+
+    def record_status(self, task_name: str, status: str):
+        self._task(task_name).record_status(status, time.time())
+
+    def record_run(self, task_name: str, duration: float, rows_changed: int):
+        self._task(task_name).record_run(duration, rows_changed, time.time())
+
+    def summary(self, task_name: Optional[str] = None) -> dict:
+        now = time.time()
+        return {
+            "uptime": round(now - self.started_at, 1),
+            "tasks": {
+                name: stats.summary(now)
+                for name, stats in self.tasks.items()
+                if task_name is None or name == task_name
+            }
+        }
+
+
+task_stats = TaskStats()
@@ -0,0 +1,118 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import delete, select
+from sqlalchemy.exc import SQLAlchemyError
+from app.db.database import get_db_context, dialect_insert
+from app.db.models import LeaderLease
+from config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+LEADER_BACKENDS = ("database", "local")
+
+
+class LeaderElection:
+    def __init__(
+            self,
+            name: str = "currency_update",
+            holder: str = settings.WORKER_ID,
+            ttl: int = settings.LEADER_LEASE_TTL,
+            backend: str = settings.LEADER_ELECTION
+    ):
+        if backend not in LEADER_BACKENDS:
+            raise ValueError(f"Неизвестный механизм выбора лидера: {backend}")
+
+        self.name = name
+        self.holder = holder
+        self.ttl = ttl
+        self.backend = backend
+        self.is_leader = backend == "local"
+        self._task: Optional[asyncio.Task] = None
+
+    async def try_acquire(self) -> bool:
+        if self.backend == "local":
+            self.is_leader = True
+            return True
+
+        now = datetime.utcnow()
+        try:
+            async with get_db_context() as db:
+                upsert = dialect_insert(db)
+                stmt = upsert(LeaderLease).values(
+                    name=self.name,
+                    holder=self.holder,
+                    expires_at=now + timedelta(seconds=self.ttl)
+                )
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[LeaderLease.name],
+                    set_={
+                        "holder": stmt.excluded.holder,
+                        "expires_at": stmt.excluded.expires_at
+                    },
+                    where=(LeaderLease.expires_at < now) | (LeaderLease.holder == stmt.excluded.holder)
+                ).returning(LeaderLease.holder)
+
+                result = await db.execute(stmt)
+                acquired = result.scalar_one_or_none() == self.holder
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при продлении аренды лидера: {e}")
+            acquired = False
+
+        if acquired != self.is_leader:
+            if acquired:
+                logger.info(f"Воркер {self.holder} стал лидером фонового обновления")
+            else:
+                logger.warning(f"Воркер {self.holder} больше не является лидером фонового обновления")
+        self.is_leader = acquired
+        return acquired
+
+    async def current_holder(self) -> Optional[str]:
+        if self.is_leader:
+            return self.holder
+        try:
+            async with get_db_context() as db:
+                result = await db.execute(
+                    select(LeaderLease.holder).where(
+                        LeaderLease.name == self.name,
+                        LeaderLease.expires_at >= datetime.utcnow()
+                    )
+                )
+                return result.scalar_one_or_none()
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при чтении аренды лидера: {e}")
+            return None
+
+    async def release(self):
+        if self.backend == "local" or not self.is_leader:
+            return
+        try:
+            async with get_db_context() as db:
+                await db.execute(
+                    delete(LeaderLease).where(
+                        LeaderLease.name == self.name,
+                        LeaderLease.holder == self.holder
+                    )
+                )
+        except SQLAlchemyError as e:
+            logger.error(f"Ошибка при освобождении аренды лидера: {e}")
+        self.is_leader = False
+
+    async def _run(self):
+        while True:
+            await self.try_acquire()
+            await asyncio.sleep(self.ttl / 3)
+
+    def start(self):
+        if self._task is None and self.backend != "local":
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.release()
+
+
+leader_election = LeaderElection()
@@ -0,0 +1,143 @@
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+from app.tasks.currency_task import CurrencyUpdateTask
+from app.tasks.leader import LeaderElection
+from config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TaskScheduler:
+    def __init__(
+            self,
+            interval: int = settings.TASK_INTERVAL_SECONDS,
+            jitter: float = settings.TASK_JITTER_SECONDS
+    ):
+        self.interval = interval
+        self.jitter = jitter
+        self.task: Optional[CurrencyUpdateTask] = None
+        self.leader: Optional[LeaderElection] = None
+        self.is_running = False
+        self.runs = 0
+        self.skipped = 0
+        self.coalesced = 0
+        self.waiters = 0
+        self.last_trigger: Optional[str] = None
+        self.last_status: Optional[str] = None
+        self.last_started_at: Optional[datetime] = None
+        self.last_finished_at: Optional[datetime] = None
+        self.last_duration: Optional[float] = None
+        self.last_rows_changed = 0
+        self.next_run_at: Optional[datetime] = None
+        self._in_flight: Optional[asyncio.Task] = None
+        self._loop_task: Optional[asyncio.Task] = None
+
+    @property
+    def in_flight(self) -> bool:
+        return self._in_flight is not None and not self._in_flight.done()
+
+    def trigger(self, source: str = "manual") -> tuple[asyncio.Task, bool]:
+        if self.task is None:
+            raise RuntimeError("Планировщик задач не запущен")
+        if self.leader is not None and not self.leader.is_leader:
+            raise RuntimeError("Воркер не является лидером фонового обновления")
+
+        if self.in_flight:
+            self.coalesced += 1
+            return self._in_flight, False
+
+        self.last_trigger = source
+        self._in_flight = asyncio.create_task(self._execute())
+        return self._in_flight, True
+
+    async def run(self, source: str = "manual") -> int:
+        run, _ = self.trigger(source)
+        return await self.join(run)
+
+    async def join(self, run: asyncio.Task) -> int:
+        self.waiters += 1
+        try:
+            return await asyncio.shield(run)
+        finally:
+            self.waiters -= 1
+
+    async def _execute(self) -> int:
+        self.runs += 1
+        self.last_started_at = datetime.utcnow()
+        started = time.monotonic()
+        try:
+            rows_changed = await self.task.run_task()
+            self.last_status = self.task.last_status
+            self.last_rows_changed = rows_changed
+            return rows_changed
+        except Exception as e:
+            logger.error(f"Ошибка при выполнении задачи обновления курсов: {e}")
+            self.last_status = "failed"
+            return 0
+        finally:
+            self.last_duration = time.monotonic() - started
+            self.last_finished_at = datetime.utcnow()
+
+    def _next_delay(self) -> float:
+        return self.interval + random.uniform(0, self.jitter)
+
+    async def _run_loop(self):
+        while self.is_running:
+            delay = self._next_delay()
+            self.next_run_at = datetime.utcnow() + timedelta(seconds=delay)
+            await asyncio.sleep(delay)
+
+            if self.leader is not None and not self.leader.is_leader:
+                logger.debug("Воркер не является лидером, обновление курсов пропущено")
+                continue
+            if self.in_flight:
+                self.skipped += 1
+                logger.warning("Предыдущее обновление курсов ещё выполняется, запуск пропущен")
+                continue
+
+            await self.run("schedule")
+
+    def start(self, task: CurrencyUpdateTask, leader: Optional[LeaderElection] = None, run_immediately: bool = True):
+        self.task = task
+        self.leader = leader
+        self.is_running = True
+        if run_immediately and (leader is None or leader.is_leader):
+            self.trigger("startup")
+        if self._loop_task is None:
+            self._loop_task = asyncio.create_task(self._run_loop())
+
+    async def stop(self):
+        self.is_running = False
+        self.next_run_at = None
+        for task in (self._loop_task, self._in_flight):
+            if task is not None and not task.done():
+                task.cancel()
+        self._loop_task = None
+
+    def status(self) -> dict:
+        return {
+            "running": self.is_running,
+            "worker": settings.WORKER_ID,
+            "leader": self.leader.is_leader if self.leader is not None else True,
+            "in_flight": self.in_flight,
+            "interval": self.interval,
+            "jitter": self.jitter,
+            "next_run_at": self.next_run_at.isoformat() if self.next_run_at else None,
+            "last_trigger": self.last_trigger,
+            "last_status": self.last_status,
+            "last_started_at": self.last_started_at.isoformat() if self.last_started_at else None,
+            "last_finished_at": self.last_finished_at.isoformat() if self.last_finished_at else None,
+            "last_duration": self.last_duration,
+            "last_rows_changed": self.last_rows_changed,
+            "queue_depth": self.waiters,
+            "runs": self.runs,
+            "skipped": self.skipped,
+            "coalesced_triggers": self.coalesced
+        }
+
+
+scheduler = TaskScheduler()
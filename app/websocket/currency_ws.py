@@ -1,49 +1,285 @@
 import json
 import asyncio
 from fastapi import WebSocket, WebSocketDisconnect
-from sqlalchemy.ext.asyncio import AsyncSession
-from app.services.currency_service import CurrencyService
+from typing import Optional
+from app.schemas.currency import parse_pair
+from app.services.metrics import websocket_broadcast_duration
+from app.services.rate_cache import rate_cache
+from app.services.serialization import dumps, rate_key, rates_delta_message
+from config import settings
 import logging
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
 
+SLOW_CONSUMER_POLICIES = ("drop_oldest", "coalesce", "disconnect")
+PROTOCOL_MODES = ("full", "delta")
+RESYNC = object()
+
+
+class ClientConnection:
+    def __init__(self, websocket: WebSocket, queue_size: int, mode: str):
+        self.websocket = websocket
+        self.mode = mode
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.sender: Optional[asyncio.Task] = None
+        self.pairs: set[tuple[str, str]] = set()
+        self.bases: set[str] = set()
+
+    @property
+    def is_filtered(self) -> bool:
+        return bool(self.pairs or self.bases)
+
+    def wants(self, base_currency: str, target_currency: str) -> bool:
+        return base_currency in self.bases or (base_currency, target_currency) in self.pairs
+
+
 class WebSocketManager:
-    def __init__(self):
-        self.active_connections: list[WebSocket] = []
+    def __init__(
+            self,
+            queue_size: int = settings.WS_SEND_QUEUE_SIZE,
+            policy: str = settings.WS_SLOW_CONSUMER_POLICY
+    ):
+        if policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"Неизвестная политика для медленных клиентов: {policy}")
+
+        self.queue_size = queue_size
+        self.policy = policy
+        self.active_connections: dict[WebSocket, ClientConnection] = {}
+        self.unfiltered: set[ClientConnection] = set()
+        self.pair_index: dict[tuple[str, str], set[ClientConnection]] = {}
+        self.base_index: dict[str, set[ClientConnection]] = {}
+        self.dropped_messages = 0
+        self.slow_disconnects = 0
+        self.send_errors = 0
 
-    async def connect(self, websocket: WebSocket):
+    async def connect(self, websocket: WebSocket, mode: str = settings.WS_PROTOCOL_MODE):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        client = ClientConnection(websocket, self.queue_size, mode)
+        client.sender = asyncio.create_task(self._sender(client))
+        self.active_connections[websocket] = client
+        self.unfiltered.add(client)
         logger.info(f"Новое WebSocket-подключение. Всего подключений: {len(self.active_connections)}")
 
     def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+        client = self.active_connections.get(websocket)
+        if client is None:
+            return
+        self.unsubscribe(websocket, client.pairs, client.bases)
+        self.unfiltered.discard(client)
+        del self.active_connections[websocket]
+        if client.sender and client.sender is not asyncio.current_task():
+            client.sender.cancel()
         logger.info(f"WebSocket отключён. Всего подключений: {len(self.active_connections)}")
 
-    async def send_personal_message(self, message: dict, websocket: WebSocket):
+    def subscribe(self, websocket: WebSocket, pairs, bases) -> Optional[ClientConnection]:
+        client = self.active_connections.get(websocket)
+        if client is None:
+            return None
+
+        for pair in pairs:
+            client.pairs.add(pair)
+            self.pair_index.setdefault(pair, set()).add(client)
+        for base in bases:
+            client.bases.add(base)
+            self.base_index.setdefault(base, set()).add(client)
+
+        if client.is_filtered:
+            self.unfiltered.discard(client)
+        return client
+
+    def unsubscribe(self, websocket: WebSocket, pairs, bases) -> Optional[ClientConnection]:
+        client = self.active_connections.get(websocket)
+        if client is None:
+            return None
+
+        for pair in list(pairs):
+            client.pairs.discard(pair)
+            subscribers = self.pair_index.get(pair)
+            if subscribers is not None:
+                subscribers.discard(client)
+                if not subscribers:
+                    del self.pair_index[pair]
+        for base in list(bases):
+            client.bases.discard(base)
+            subscribers = self.base_index.get(base)
+            if subscribers is not None:
+                subscribers.discard(client)
+                if not subscribers:
+                    del self.base_index[base]
+
+        if not client.is_filtered:
+            self.unfiltered.add(client)
+        return client
+
+    def _subscribers_of(self, rate: dict) -> set[ClientConnection]:
+        base_currency = rate["base_currency"]
+        return (
+            self.pair_index.get((base_currency, rate["target_currency"]), set())
+            | self.base_index.get(base_currency, set())
+        )
+
+    async def close(self):
+        for websocket in list(self.active_connections):
+            self.disconnect(websocket)
+
+    async def _sender(self, client: ClientConnection):
         try:
-            message_json = json.dumps(message)
-            await websocket.send_text(message_json)
+            while True:
+                message = await client.queue.get()
+                if message is RESYNC:
+                    message = await self._snapshot_message()
+                await client.websocket.send_text(message)
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
-            logger.error(f"Ошибка при отправке личного сообщения: {e}")
-            self.disconnect(websocket)
+            logger.error(f"Ошибка при отправке по WebSocket: {e}")
+            self.send_errors += 1
+            self.disconnect(client.websocket)
+
+    async def _snapshot_message(self) -> str:
+        snapshot = await current_snapshot()
+        return snapshot.frame("rates_list")
+
+    def set_mode(self, websocket: WebSocket, mode: str) -> bool:
+        client = self.active_connections.get(websocket)
+        if client is None or mode not in PROTOCOL_MODES:
+            return False
+        client.mode = mode
+        return True
+
+    async def _close_slow_client(self, websocket: WebSocket):
+        try:
+            await websocket.close(code=1013)
+        except Exception as e:
+            logger.debug(f"Не удалось закрыть медленное WebSocket-подключение: {e}")
+
+    def _enqueue(self, client: ClientConnection, message_json: str):
+        try:
+            client.queue.put_nowait(message_json)
+            return
+        except asyncio.QueueFull:
+            pass
+
+        if self.policy == "disconnect":
+            client.dropped += 1
+            self.dropped_messages += 1
+            self.slow_disconnects += 1
+            logger.warning("Медленный WebSocket-клиент отключён: очередь отправки переполнена")
+            self.disconnect(client.websocket)
+            asyncio.create_task(self._close_slow_client(client.websocket))
+            return
+
+        if self.policy == "coalesce":
+            while not client.queue.empty():
+                client.queue.get_nowait()
+                client.dropped += 1
+                self.dropped_messages += 1
+            client.queue.put_nowait(RESYNC)
+            return
+
+        client.queue.get_nowait()
+        client.dropped += 1
+        self.dropped_messages += 1
+        client.queue.put_nowait(message_json)
+
+    async def send_personal_message(self, message: dict, websocket: WebSocket):
+        client = self.active_connections.get(websocket)
+        if client is None:
+            return
+        self._enqueue(client, dumps(message).decode())
+
+    async def send_encoded(self, message_json: str, websocket: WebSocket):
+        client = self.active_connections.get(websocket)
+        if client is None:
+            return
+        self._enqueue(client, message_json)
 
     async def broadcast(self, message: dict):
-        message_json = json.dumps(message)
-        disconnected = []
+        await self._broadcast_to(list(self.active_connections.values()), message)
 
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message_json)
-            except Exception as e:
-                logger.error(f"Ошибка при рассылке по WebSocket: {e}")
-                disconnected.append(connection)
+    async def _broadcast_to(self, clients: list[ClientConnection], message: dict):
+        if clients:
+            await self._broadcast_encoded(clients, dumps(message).decode())
+
+    async def _broadcast_encoded(self, clients: list[ClientConnection], message_json: str):
+        for client in clients:
+            self._enqueue(client, message_json)
+        await asyncio.sleep(0)
+
+    async def broadcast_rate_changes(
+            self,
+            changed: list[dict],
+            removed: Optional[list[dict]] = None,
+            action: str = "updated",
+            frame: Optional[bytes] = None
+    ):
+        removed = removed or []
+        if not changed and not removed:
+            return
+
+        with websocket_broadcast_duration.time():
+            rows = [(rate, False) for rate in changed] + [(rate, True) for rate in removed]
+            row_subscribers = [self._subscribers_of(rate) for rate, _ in rows]
+            delta_clients = [client for client in self.unfiltered if client.mode == "delta"]
+            full_clients = [client for client in self.unfiltered if client.mode == "full"]
+            timestamp = datetime.utcnow().isoformat()
+
+            if delta_clients:
+                if frame is None:
+                    frame = dumps(rates_delta_message(changed, removed, action, rate_cache.version))
+                await self._broadcast_encoded(delta_clients, frame.decode())
+
+            subscribed_rows: dict[ClientConnection, list[int]] = {}
+            for index, subscribers in enumerate(row_subscribers):
+                for client in subscribers:
+                    if client.mode == "delta":
+                        subscribed_rows.setdefault(client, []).append(index)
+
+            groups: dict[tuple[int, ...], list[ClientConnection]] = {}
+            for client, indices in subscribed_rows.items():
+                groups.setdefault(tuple(indices), []).append(client)
+
+            for indices, clients in groups.items():
+                message = rates_delta_message(
+                    [rows[index][0] for index in indices if not rows[index][1]],
+                    [rows[index][0] for index in indices if rows[index][1]],
+                    action,
+                    rate_cache.version
+                )
+                await self._broadcast_encoded(clients, dumps(message).decode())
+
+            for (rate, is_removed), subscribers in zip(rows, row_subscribers):
+                recipients = full_clients + [client for client in subscribers if client.mode == "full"]
+                if not recipients:
+                    continue
+                await self._broadcast_to(recipients, {
+                    "type": "currency_update",
+                    "data": {**rate_key(rate), "action": "deleted"} if is_removed else {**rate, "action": action},
+                    "timestamp": timestamp
+                })
 
-        for connection in disconnected:
-            self.disconnect(connection)
+            if full_clients:
+                await self._broadcast_encoded(full_clients, await self._snapshot_message())
+
+    def stats(self) -> dict:
+        depths = [client.queue.qsize() for client in self.active_connections.values()]
+        return {
+            "connections": len(depths),
+            "delta_clients": sum(1 for client in self.active_connections.values() if client.mode == "delta"),
+            "filtered_clients": len(depths) - len(self.unfiltered),
+            "subscribed_pairs": len(self.pair_index),
+            "subscribed_bases": len(self.base_index),
+            "policy": self.policy,
+            "queue_size": self.queue_size,
+            "queued_messages": sum(depths),
+            "max_queue_depth": max(depths, default=0),
+            "dropped_messages": self.dropped_messages,
+            "slow_consumer_disconnects": self.slow_disconnects,
+            "send_errors": self.send_errors
+        }
 
     async def broadcast_currency_update(self, update_data: dict):
         logger.info(f"Отправка обновления курса в WebSocket: {update_data}")
@@ -66,26 +302,29 @@ class WebSocketManager:
 websocket_manager = WebSocketManager()
 
 
-async def websocket_endpoint(websocket: WebSocket, db: AsyncSession):
-    await websocket_manager.connect(websocket)
+async def current_snapshot():
+    return await rate_cache.get()
+
+
+def parse_subscription(message: dict) -> tuple[list[tuple[str, str]], list[str]]:
+    pairs = message.get("pairs") or []
+    bases = message.get("bases") or []
+    if not isinstance(pairs, list) or not isinstance(bases, list):
+        raise ValueError("'pairs' and 'bases' must be lists")
+    if not all(isinstance(base, str) and base for base in bases):
+        raise ValueError("'bases' must contain currency codes")
+    return [parse_pair(pair) for pair in pairs], [base.upper() for base in bases]
+
+
+async def websocket_endpoint(websocket: WebSocket):
+    mode = websocket.query_params.get("mode", settings.WS_PROTOCOL_MODE)
+    if mode not in PROTOCOL_MODES:
+        mode = settings.WS_PROTOCOL_MODE
+    await websocket_manager.connect(websocket, mode)
 
     try:
-        rates = await CurrencyService.get_all_rates(db)
-        initial_data = {
-            "type": "initial",
-            "data": [
-                {
-                    "id": rate.id,
-                    "base_currency": rate.base_currency,
-                    "target_currency": rate.target_currency,
-                    "rate": float(rate.rate),
-                    "last_updated": rate.last_updated.isoformat() if rate.last_updated else None
-                }
-                for rate in rates
-            ],
-            "timestamp": datetime.utcnow().isoformat()
-        }
-        await websocket_manager.send_personal_message(initial_data, websocket)
+        snapshot = await current_snapshot()
+        await websocket_manager.send_encoded(snapshot.frame("initial", mode=mode), websocket)
 
         while True:
             data = await websocket.receive_text()
@@ -99,22 +338,49 @@ async def websocket_endpoint(websocket: WebSocket, db: AsyncSession):
                         "timestamp": datetime.utcnow().isoformat()
                     }, websocket)
                 elif message.get("type") == "get_rates":
-                    rates = await CurrencyService.get_all_rates(db)
-                    rates_data = {
-                        "type": "rates_list",
+                    snapshot = await current_snapshot()
+                    await websocket_manager.send_encoded(snapshot.frame("rates_list"), websocket)
+                elif message.get("type") in ("subscribe", "unsubscribe"):
+                    try:
+                        pairs, bases = parse_subscription(message)
+                    except ValueError as e:
+                        await websocket_manager.send_personal_message({
+                            "type": "error",
+                            "message": str(e)
+                        }, websocket)
+                        continue
+
+                    if message["type"] == "subscribe":
+                        client = websocket_manager.subscribe(websocket, pairs, bases)
+                    else:
+                        client = websocket_manager.unsubscribe(websocket, pairs, bases)
+                    if client is None:
+                        continue
+
+                    snapshot = await current_snapshot()
+                    await websocket_manager.send_personal_message({
+                        "type": "subscriptions",
+                        "pairs": [f"{base}/{target}" for base, target in sorted(client.pairs)],
+                        "bases": sorted(client.bases),
                         "data": [
-                            {
-                                "id": rate.id,
-                                "base_currency": rate.base_currency,
-                                "target_currency": rate.target_currency,
-                                "rate": float(rate.rate),
-                                "last_updated": rate.last_updated.isoformat() if rate.last_updated else None
-                            }
-                            for rate in rates
+                            rate for rate in snapshot.rates
+                            if client.wants(rate["base_currency"], rate["target_currency"])
                         ],
+                        "version": snapshot.version,
                         "timestamp": datetime.utcnow().isoformat()
-                    }
-                    await websocket_manager.send_personal_message(rates_data, websocket)
+                    }, websocket)
+                elif message.get("type") == "set_mode":
+                    if websocket_manager.set_mode(websocket, message.get("mode")):
+                        await websocket_manager.send_personal_message({
+                            "type": "mode",
+                            "mode": message.get("mode"),
+                            "timestamp": datetime.utcnow().isoformat()
+                        }, websocket)
+                    else:
+                        await websocket_manager.send_personal_message({
+                            "type": "error",
+                            "message": f"Unknown mode, expected one of: {', '.join(PROTOCOL_MODES)}"
+                        }, websocket)
 
             except json.JSONDecodeError:
                 logger.error(f"Получен некорректный JSON: {data}")
@@ -128,4 +394,4 @@ async def websocket_endpoint(websocket: WebSocket, db: AsyncSession):
         logger.info("WebSocket отключён")
     except Exception as e:
         logger.error(f"Ошибка WebSocket: {e}")
-        websocket_manager.disconnect(websocket)
\ No newline at end of file
+        websocket_manager.disconnect(websocket)
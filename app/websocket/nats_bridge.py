@@ -0,0 +1,101 @@
+import asyncio
+import json
+from collections import OrderedDict
+from typing import Optional
+from app.nats.publisher import nats_publisher
+from app.services.rate_events import apply_remote_changes
+from config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class NATSWebSocketBridge:
+    def __init__(self, flush_interval: float = settings.WS_NATS_FANOUT_INTERVAL):
+        self.flush_interval = flush_interval
+        self.subject = f"{settings.NATS_CHANNEL}.>"
+        self.state_prefix = f"{settings.NATS_CHANNEL}.state."
+        self.pending: dict[str, OrderedDict[tuple[str, str], dict]] = {}
+        self.received = 0
+        self.skipped_own = 0
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._subscription = None
+
+    async def _on_message(self, msg):
+        try:
+            message = json.loads(msg.data)
+            if message.get("origin") == settings.WORKER_ID:
+                self.skipped_own += 1
+                return
+
+            data = message["data"]
+            pair = (data["base_currency"], data["target_currency"])
+            action = message.get("action", "updated")
+            if msg.subject.startswith(self.state_prefix):
+                queued = next(
+                    (rates for name, rates in self.pending.items() if name != "deleted" and pair in rates), None
+                )
+                if queued is not None:
+                    queued[pair] = data
+                else:
+                    self.pending.setdefault("state", OrderedDict())[pair] = data
+            else:
+                for pending in self.pending.values():
+                    pending.pop(pair, None)
+                self.pending.setdefault(action, OrderedDict())[pair] = data
+            self.received += 1
+            self._wakeup.set()
+        except (ValueError, KeyError, TypeError) as e:
+            logger.error(f"Некорректное сообщение NATS [{msg.subject}]: {e}")
+
+    async def flush(self):
+        pending, self.pending = self.pending, {}
+        for action, rates in pending.items():
+            if action == "deleted":
+                await apply_remote_changes([], list(rates.values()), action)
+            elif action == "state":
+                await apply_remote_changes(list(rates.values()), broadcast=False)
+            else:
+                await apply_remote_changes(list(rates.values()), action=action)
+
+    async def _run(self):
+        while not nats_publisher.nc.is_connected:
+            await asyncio.sleep(1)
+
+        self._subscription = await nats_publisher.nc.subscribe(self.subject, cb=self._on_message)
+        logger.info(f"Трансляция NATS → WebSocket подписана на {self.subject}")
+
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Ошибка при трансляции обновлений NATS в WebSocket: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._subscription is not None:
+            try:
+                await self._subscription.unsubscribe()
+            except Exception as e:
+                logger.debug(f"Не удалось отписаться от NATS: {e}")
+            self._subscription = None
+
+    def stats(self) -> dict:
+        return {
+            "received": self.received,
+            "skipped_own": self.skipped_own,
+            "pending": sum(len(rates) for rates in self.pending.values())
+        }
+
+
+nats_bridge = NATSWebSocketBridge()
@@ -0,0 +1,294 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+from benchmarks.stubs import StubNATS, StubRateProvider, StubWebSocket
+
+PAIRS_PER_PROVIDER = 10000
+
+
+def summarize(samples: list[float]) -> dict:
+    if not samples:
+        return {"count": 0}
+    values = np.asarray(samples) * 1000
+    return {
+        "count": len(samples),
+        "mean_ms": round(float(values.mean()), 3),
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3),
+        "max_ms": round(float(values.max()), 3)
+    }
+
+
+def currency_code(index: int) -> str:
+    return "".join(chr(ord("A") + index // 26 ** power % 26) for power in (2, 1, 0))
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def configure_environment(workdir: str, provider_url: str):
+    os.environ.update({
+        "DATABASE_URL": f"sqlite+aiosqlite:///{os.path.join(workdir, 'benchmark.db')}",
+        "CURRENCY_API_URLS": f"{provider_url}/USD/100",
+        "TASK_INTERVAL_SECONDS": "86400",
+        "TASK_JITTER_SECONDS": "0",
+        "LEADER_ELECTION": "local",
+        "WS_NATS_FANOUT": "False",
+        "LOG_LEVEL": os.getenv("LOG_LEVEL", "WARNING")
+    })
+
+
+async def run_requests(client, make_request, total: int, concurrency: int) -> tuple[dict, dict]:
+    latencies: dict[str, list[float]] = {}
+    errors: dict[str, int] = {}
+    counter = iter(range(total))
+
+    async def worker():
+        for index in counter:
+            async for name, started, response in make_request(client, index):
+                latencies.setdefault(name, []).append(time.perf_counter() - started)
+                if response.is_error:
+                    errors[name] = errors.get(name, 0) + 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors
+
+
+async def bench_rest(client, total: int, concurrency: int) -> dict:
+    prefix = "/api/v1/currency"
+    seed = [
+        {"base_currency": "BNC", "target_currency": currency_code(index), "rate": 1 + index / 1000}
+        for index in range(1000)
+    ]
+    response = await client.post(f"{prefix}/rates/bulk", json=seed)
+    response.raise_for_status()
+    ids = [rate["id"] for rate in response.json()]
+
+    async def list_rates(client, index):
+        started = time.perf_counter()
+        yield "GET /rates", started, await client.get(f"{prefix}/rates")
+
+    async def list_page(client, index):
+        started = time.perf_counter()
+        yield "GET /rates?limit=100", started, \
+            await client.get(f"{prefix}/rates", params={"limit": 100, "base_currency": "BNC"})
+
+    async def get_rate(client, index):
+        started = time.perf_counter()
+        yield "GET /rates/{id}", started, await client.get(f"{prefix}/rates/{ids[index % len(ids)]}")
+
+    async def crud(client, index):
+        started = time.perf_counter()
+        response = await client.post(f"{prefix}/rates", json={
+            "base_currency": "CRD", "target_currency": currency_code(index), "rate": 1.5
+        })
+        yield "POST /rates", started, response
+        if response.is_error:
+            return
+        rate_id = response.json()["id"]
+
+        started = time.perf_counter()
+        yield "PATCH /rates/{id}", started, await client.patch(f"{prefix}/rates/{rate_id}", json={"rate": 1.6})
+
+        started = time.perf_counter()
+        yield "DELETE /rates/{id}", started, await client.delete(f"{prefix}/rates/{rate_id}")
+
+    results = {}
+    for scenario in (list_rates, list_page, get_rate, crud):
+        started = time.perf_counter()
+        latencies, errors = await run_requests(client, scenario, total, concurrency)
+        elapsed = time.perf_counter() - started
+        for name, samples in latencies.items():
+            results[name] = {
+                **summarize(samples),
+                "throughput_rps": round(len(samples) / elapsed, 1),
+                "errors": errors.get(name, 0)
+            }
+    return results
+
+
+async def bench_fanout(manager, rates: list[dict], clients: int, mode: str, rounds: int) -> dict:
+    expected_per_client = 1 if mode == "delta" else 2
+    state = {"started": 0.0, "remaining": 0, "latencies": []}
+    done = asyncio.Event()
+
+    def on_message(websocket, received_at):
+        state["latencies"].append(received_at - state["started"])
+        state["remaining"] -= 1
+        if state["remaining"] == 0:
+            done.set()
+
+    sockets = [StubWebSocket(on_message) for _ in range(clients)]
+    for websocket in sockets:
+        await manager.connect(websocket, mode)
+    await asyncio.sleep(0)
+
+    enqueue, completion, delivery = [], [], []
+    try:
+        for index in range(rounds):
+            rate = {**rates[index % len(rates)], "rate": 1 + index / 100}
+            done.clear()
+            state["latencies"] = []
+            state["remaining"] = clients * expected_per_client
+            state["started"] = time.perf_counter()
+
+            await manager.broadcast_rate_changes([rate])
+            enqueue.append(time.perf_counter() - state["started"])
+            await asyncio.wait_for(done.wait(), timeout=120)
+            completion.append(time.perf_counter() - state["started"])
+            delivery.extend(state["latencies"])
+    finally:
+        for websocket in sockets:
+            manager.disconnect(websocket)
+
+    return {
+        "clients": clients,
+        "mode": mode,
+        "rounds": rounds,
+        "broadcast_call": summarize(enqueue),
+        "all_delivered": summarize(completion),
+        "per_message_delivery": summarize(delivery),
+        "dropped_messages": manager.dropped_messages,
+        "send_errors": manager.send_errors
+    }
+
+
+async def bench_refresh(scheduler, fetcher, provider_url: str, pairs: int) -> dict:
+    from app.services.rate_providers import RateProvider
+
+    providers = math.ceil(pairs / PAIRS_PER_PROVIDER)
+    per_provider = math.ceil(pairs / providers)
+
+    def urls(seed: int) -> list[str]:
+        return [f"{provider_url}/P{pairs}X{index:02d}/{per_provider}?seed={seed}" for index in range(providers)]
+
+    cycles = {}
+    for name, seed in (("cold_insert", 0), ("unchanged", 0), ("all_changed", 1)):
+        if name != "unchanged":
+            fetcher.providers = [RateProvider(url) for url in urls(seed)]
+        started = time.perf_counter()
+        rows_changed = await scheduler.run("benchmark")
+        cycles[name] = {
+            "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+            "rows_changed": rows_changed,
+            "status": scheduler.last_status
+        }
+    return {"pairs": providers * per_provider, "providers": providers, "cycles": cycles}
+
+
+async def run(args) -> dict:
+    import httpx
+    import main as app_main
+    from app.nats.publisher import nats_publisher
+    from app.services.rate_providers import rate_fetcher
+    from app.tasks.scheduler import scheduler
+    from app.websocket.currency_ws import websocket_manager
+
+    stub_nats = StubNATS()
+    nats_publisher.nc = stub_nats
+
+    results = {}
+    async with app_main.lifespan(app_main.app):
+        await scheduler.run("benchmark")
+
+        transport = httpx.ASGITransport(app=app_main.app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            print("REST...", file=sys.stderr)
+            results["rest"] = await bench_rest(client, args.requests, args.concurrency)
+            rates = (await client.get("/api/v1/currency/rates", params={"limit": 100})).json()
+
+        results["websocket_fanout"] = []
+        for clients in args.clients:
+            for mode in args.modes:
+                print(f"WebSocket fan-out: {clients} клиентов, режим {mode}...", file=sys.stderr)
+                results["websocket_fanout"].append(
+                    await bench_fanout(websocket_manager, rates, clients, mode, args.rounds)
+                )
+
+        results["refresh_cycle"] = []
+        for pairs in args.pairs:
+            print(f"Цикл обновления: {pairs} пар...", file=sys.stderr)
+            results["refresh_cycle"].append(await bench_refresh(scheduler, rate_fetcher, args.provider_url, pairs))
+
+        await nats_publisher.flush()
+        results["nats"] = {**nats_publisher.stats(), "bytes": stub_nats.bytes}
+    return results
+
+
+def parse_list(value: str) -> list[int]:
+    return [int(item) for item in value.split(",") if item]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарки REST, WebSocket-рассылки и цикла обновления курсов")
+    parser.add_argument("--output", default=None, help="JSON-файл с результатами")
+    parser.add_argument("--requests", type=int, default=2000, help="Запросов на сценарий REST")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--clients", type=parse_list, default=[1000, 10000])
+    parser.add_argument("--modes", type=lambda value: value.split(","), default=["delta", "full"])
+    parser.add_argument("--rounds", type=int, default=20, help="Рассылок на сценарий WebSocket")
+    parser.add_argument("--pairs", type=parse_list, default=[100, 1000, 10000, 50000])
+    parser.add_argument("--quick", action="store_true", help="Сокращённый прогон для проверки")
+    args = parser.parse_args()
+
+    if args.quick:
+        args.requests, args.clients, args.rounds, args.pairs = 200, [1000], 5, [100, 1000]
+
+    provider = StubRateProvider()
+    provider.start()
+    args.provider_url = provider.url
+
+    with tempfile.TemporaryDirectory() as workdir:
+        configure_environment(workdir, provider.url)
+        started = datetime.utcnow()
+        try:
+            results = asyncio.run(run(args))
+        finally:
+            provider.stop()
+
+    report = {
+        "started_at": started.isoformat(),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "clients": args.clients,
+            "modes": args.modes,
+            "rounds": args.rounds,
+            "pairs": args.pairs
+        },
+        "results": results
+    }
+
+    output = args.output or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "results", f"{started:%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import asyncio
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubRateProvider:
+    def __init__(self):
+        self.requests = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                stub.requests += 1
+                path, _, query = self.path.partition("?")
+                base_currency, pairs = path.strip("/").split("/")
+                seed = int(query.partition("=")[2] or 0)
+                rng = random.Random(f"{base_currency}-{seed}")
+                body = json.dumps({
+                    "result": "success",
+                    "base_code": base_currency,
+                    "conversion_rates": {
+                        f"C{index:05d}": round(rng.uniform(0.01, 1000), 6) for index in range(int(pairs))
+                    }
+                }).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class StubNATS:
+    def __init__(self):
+        self.is_connected = False
+        self.is_reconnecting = False
+        self.published = 0
+        self.bytes = 0
+
+    async def connect(self, **kwargs):
+        self.is_connected = True
+
+    async def publish(self, subject: str, payload: bytes):
+        self.published += 1
+        self.bytes += len(payload)
+
+    async def flush(self):
+        await asyncio.sleep(0)
+
+    async def subscribe(self, subject: str, cb=None, **kwargs):
+        return None
+
+    async def close(self):
+        self.is_connected = False
+
+
+class StubWebSocket:
+    def __init__(self, on_message):
+        self.on_message = on_message
+        self.received = 0
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data: str):
+        self.received += 1
+        self.on_message(self, time.perf_counter())
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        pass
@@ -1,4 +1,5 @@
 import os
+import socket
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -12,12 +13,64 @@ class Settings:
     API_V1_PREFIX: str = os.getenv("API_V1_PREFIX", "/api/v1")
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./currency.db")
     DATABASE_ECHO: bool = os.getenv("DATABASE_ECHO", "False").lower() == "true"
+    DATABASE_PROFILE: str = os.getenv("DATABASE_PROFILE", "auto")
+    DATABASE_READ_URL: str = os.getenv("DATABASE_READ_URL", "")
+    DATABASE_POOL_SIZE: int = int(os.getenv("DATABASE_POOL_SIZE", "10"))
+    DATABASE_MAX_OVERFLOW: int = int(os.getenv("DATABASE_MAX_OVERFLOW", "20"))
+    DATABASE_POOL_TIMEOUT: float = float(os.getenv("DATABASE_POOL_TIMEOUT", "30"))
+    DATABASE_POOL_RECYCLE: int = int(os.getenv("DATABASE_POOL_RECYCLE", "1800"))
+    SQLITE_WRITE_POOL_SIZE: int = int(os.getenv("SQLITE_WRITE_POOL_SIZE", "1"))
+    SQLITE_READ_POOL_SIZE: int = int(os.getenv("SQLITE_READ_POOL_SIZE", "4"))
+    SQLITE_SYNCHRONOUS: str = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT: int = int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000"))
+    SQLITE_CACHE_SIZE: int = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))
+    SQLITE_MMAP_SIZE: int = int(os.getenv("SQLITE_MMAP_SIZE", "268435456"))
     NATS_URL: str = os.getenv("NATS_URL", "nats://localhost:4222")
     NATS_CHANNEL: str = os.getenv("NATS_CHANNEL", "currency.updates")
+    NATS_BATCH_SIZE: int = int(os.getenv("NATS_BATCH_SIZE", "500"))
+    NATS_FLUSH_INTERVAL: float = float(os.getenv("NATS_FLUSH_INTERVAL", "0.2"))
+    NATS_MAX_PENDING: int = int(os.getenv("NATS_MAX_PENDING", "10000"))
+    WORKER_ID: str = os.getenv("WORKER_ID", f"{socket.gethostname()}-{os.getpid()}")
+    WS_NATS_FANOUT: bool = os.getenv("WS_NATS_FANOUT", "True").lower() == "true"
+    COALESCE_WINDOW: float = float(os.getenv("COALESCE_WINDOW", "0.2"))
+    COALESCE_THRESHOLD: float = float(os.getenv("COALESCE_THRESHOLD", "0"))
+    COALESCE_PAIR_THRESHOLDS: str = os.getenv("COALESCE_PAIR_THRESHOLDS", "")
+    WS_NATS_FANOUT_INTERVAL: float = float(os.getenv("WS_NATS_FANOUT_INTERVAL", "0.05"))
+    SUBSCRIBER_DATABASE_URL: str = os.getenv("SUBSCRIBER_DATABASE_URL", "sqlite+aiosqlite:///./data/replica.db")
+    SUBSCRIBER_SNAPSHOT_URL: str = os.getenv("SUBSCRIBER_SNAPSHOT_URL", "")
+    SUBSCRIBER_QUEUE_GROUP: str = os.getenv("SUBSCRIBER_QUEUE_GROUP", "")
+    SUBSCRIBER_BATCH_SIZE: int = int(os.getenv("SUBSCRIBER_BATCH_SIZE", "500"))
+    SUBSCRIBER_FLUSH_INTERVAL: float = float(os.getenv("SUBSCRIBER_FLUSH_INTERVAL", "0.5"))
+    SUBSCRIBER_REPORT_INTERVAL: float = float(os.getenv("SUBSCRIBER_REPORT_INTERVAL", "10"))
+    SUBSCRIBER_DEDUP_SIZE: int = int(os.getenv("SUBSCRIBER_DEDUP_SIZE", "100000"))
     CURRENCY_API_URL: str = os.getenv("CURRENCY_API_URL", "https://v6.exchangerate-api.com/v6/420ad69df25c5df6f82be95e/latest/USD")
+    CURRENCY_API_URLS: list[str] = [
+        url.strip() for url in (os.getenv("CURRENCY_API_URLS") or CURRENCY_API_URL).split(",") if url.strip()
+    ]
+    PROVIDER_CYCLE_BUDGET: float = float(os.getenv("PROVIDER_CYCLE_BUDGET", "30"))
+    IMPORT_BATCH_SIZE: int = int(os.getenv("IMPORT_BATCH_SIZE", "5000"))
+    IMPORT_MAX_ERRORS: int = int(os.getenv("IMPORT_MAX_ERRORS", "100"))
+    EXPORT_CHUNK_SIZE: int = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+    EXPORT_GZIP_LEVEL: int = int(os.getenv("EXPORT_GZIP_LEVEL", "6"))
+    ANALYTICS_WINDOWS: str = os.getenv("ANALYTICS_WINDOWS", "20,50,200")
+    ANALYTICS_MAX_POINTS: int = int(os.getenv("ANALYTICS_MAX_POINTS", "1000"))
+    ANALYTICS_MAX_PAIRS: int = int(os.getenv("ANALYTICS_MAX_PAIRS", "10000"))
+    BULK_MAX_ITEMS: int = int(os.getenv("BULK_MAX_ITEMS", "5000"))
     TASK_INTERVAL_SECONDS: int = int(os.getenv("TASK_INTERVAL_SECONDS", "60"))
     TASK_MAX_RETRIES: int = int(os.getenv("TASK_MAX_RETRIES", "3"))
     TASK_RETRY_DELAY: int = int(os.getenv("TASK_RETRY_DELAY", "5"))
+    TASK_JITTER_SECONDS: float = float(os.getenv("TASK_JITTER_SECONDS", "5"))
+    LEADER_ELECTION: str = os.getenv("LEADER_ELECTION", "database")
+    LEADER_LEASE_TTL: int = int(os.getenv("LEADER_LEASE_TTL", "30"))
+    TASK_LOG_BATCH_SIZE: int = int(os.getenv("TASK_LOG_BATCH_SIZE", "50"))
+    TASK_LOG_FLUSH_INTERVAL: float = float(os.getenv("TASK_LOG_FLUSH_INTERVAL", "2"))
+    TASK_LOG_RETENTION_DAYS: int = int(os.getenv("TASK_LOG_RETENTION_DAYS", "30"))
+    TASK_LOG_MAX_ROWS: int = int(os.getenv("TASK_LOG_MAX_ROWS", "100000"))
+    TASK_LOG_COMPACTION_INTERVAL: int = int(os.getenv("TASK_LOG_COMPACTION_INTERVAL", "3600"))
+    WS_SEND_QUEUE_SIZE: int = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+    WS_SLOW_CONSUMER_POLICY: str = os.getenv("WS_SLOW_CONSUMER_POLICY", "drop_oldest")
+    WS_PROTOCOL_MODE: str = os.getenv("WS_PROTOCOL_MODE", "full")
+    CONVERSION_PIVOT: str = os.getenv("CONVERSION_PIVOT", "USD")
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
     LOG_FILE: str = os.getenv("LOG_FILE", "logs/app.log")
     SECRET_KEY: str = os.getenv("SECRET_KEY", "dev-secret-key-change-in-production")
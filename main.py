@@ -1,16 +1,22 @@
-from fastapi import FastAPI, WebSocket, Depends
+from fastapi import FastAPI, WebSocket, Response
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-import asyncio
 import logging
 
 from config import settings
-from app.db.database import init_db, get_db, AsyncSessionLocal
+from app.db.database import init_db, close_db, database_profile, AsyncSessionLocal
 from app.tasks.currency_task import CurrencyUpdateTask
+from app.tasks.leader import leader_election
+from app.tasks.scheduler import scheduler
 from app.nats.publisher import nats_publisher
-from app.api import currency, tasks
-from app.websocket.currency_ws import websocket_endpoint
-from sqlalchemy.ext.asyncio import AsyncSession
+from app.services.task_log_writer import task_log_writer
+from app.services import metrics
+from app.services.rate_providers import rate_fetcher
+from app.services.coalescer import rate_coalescer
+from app.services.analytics import rate_analytics
+from app.api import analytics, currency, export, tasks
+from app.websocket.currency_ws import websocket_endpoint, websocket_manager
+from app.websocket.nats_bridge import nats_bridge
 
 logging.basicConfig(
     level=settings.LOG_LEVEL,
@@ -18,26 +24,31 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-background_task_obj = None
-
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global background_task_obj
-
     logger.info("Запуск API мониторинга валют...")
 
     await init_db()
-    logger.info("База данных инициализирована")
+    logger.info(f"База данных инициализирована (профиль: {database_profile})")
+
+    nats_publisher.start()
+    logger.info("Публикатор NATS запущен")
+
+    rate_coalescer.start()
+
+    if settings.WS_NATS_FANOUT:
+        nats_bridge.start()
+
+    await leader_election.try_acquire()
+    leader_election.start()
 
-    await nats_publisher.connect()
-    logger.info("Публикатор NATS подключен")
+    task_log_writer.start()
 
     db = AsyncSessionLocal()
 
     try:
-        background_task_obj = CurrencyUpdateTask(db)
-        task = asyncio.create_task(background_task_obj.run_periodically())
+        scheduler.start(CurrencyUpdateTask(db), leader_election)
         logger.info("Фоновая задача обновления курсов запущена")
 
         yield
@@ -45,11 +56,16 @@ async def lifespan(app: FastAPI):
     finally:
         logger.info("Завершение работы...")
 
-        if background_task_obj:
-            background_task_obj.is_running = False
-
+        await scheduler.stop()
+        await leader_election.stop()
+        await rate_coalescer.stop()
+        await nats_bridge.stop()
+        await websocket_manager.close()
+        await task_log_writer.stop()
         await db.close()
+        await rate_fetcher.close()
         await nats_publisher.close()
+        await close_db()
         logger.info("Завершение работы выполнено")
 
 
@@ -69,16 +85,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(metrics.MetricsMiddleware)
+
+metrics.websocket_connections.set_function(lambda: len(websocket_manager.active_connections))
+metrics.websocket_send_errors.set_function(lambda: websocket_manager.send_errors)
+metrics.websocket_dropped_messages.set_function(lambda: websocket_manager.dropped_messages)
+metrics.nats_published.set_function(lambda: nats_publisher.published)
+metrics.nats_pending.set_function(lambda: len(nats_publisher.pending))
+metrics.coalescer_submitted.set_function(lambda: rate_coalescer.submitted)
+metrics.coalescer_suppressed.set_function(lambda: rate_coalescer.suppressed)
+metrics.coalescer_emitted.set_function(lambda: rate_coalescer.emitted)
+
 app.include_router(currency.router, prefix=f"{settings.API_V1_PREFIX}/currency", tags=["currency"])
+app.include_router(analytics.router, prefix=f"{settings.API_V1_PREFIX}/analytics", tags=["analytics"])
+app.include_router(export.router, prefix=f"{settings.API_V1_PREFIX}/export", tags=["export"])
 app.include_router(tasks.router, prefix=f"{settings.API_V1_PREFIX}/tasks", tags=["tasks"])
 
 
 @app.websocket("/ws/currency")
-async def websocket_currency(
-        websocket: WebSocket,
-        db: AsyncSession = Depends(get_db)
-):
-    await websocket_endpoint(websocket, db)
+async def websocket_currency(websocket: WebSocket):
+    await websocket_endpoint(websocket)
 
 
 @app.get("/")
@@ -91,12 +117,26 @@ async def root():
     }
 
 
+@app.get("/metrics")
+async def metrics_endpoint():
+    return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
 @app.get("/health")
 async def health_check():
     return {
         "status": "healthy",
         "nats_connected": nats_publisher.is_connected,
-        "background_task_running": background_task_obj.is_running if background_task_obj else False
+        "nats": nats_publisher.stats(),
+        "nats_fanout": nats_bridge.stats(),
+        "coalescer": rate_coalescer.stats(),
+        "analytics": rate_analytics.stats(),
+        "background_task_running": scheduler.is_running,
+        "background_task_in_flight": scheduler.in_flight,
+        "background_task_leader": leader_election.is_leader,
+        "websocket": websocket_manager.stats(),
+        "task_logs": task_log_writer.stats(),
+        "providers": rate_fetcher.stats()
     }
 
 
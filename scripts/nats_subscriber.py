@@ -1,69 +1,305 @@
 import asyncio
-import json
-import os
-import logging
-from nats.aio.client import Client as NATS
+import signal
+import time
+from collections import OrderedDict
 from datetime import datetime
+from typing import Optional
+import httpx
+from nats.aio.client import Client as NATS
+from sqlalchemy import delete, select, tuple_
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from app.db.database import create_engines, dialect_insert
+from app.db.models import CurrencyRate
+from app.services.serialization import loads
+from config import settings
+import logging
 
 logging.basicConfig(
-    level=os.getenv("LOG_LEVEL", "INFO"),
+    level=settings.LOG_LEVEL,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
 
+MAX_RETRIES = 10
+RETRY_DELAY = 5
 
-async def message_handler(msg):
-    try:
-        data = json.loads(msg.data.decode())
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        logger.info(f"[{timestamp}] NATS [{msg.subject}]: {json.dumps(data, indent=2)}")
-    except Exception as e:
-        logger.error(f"Ошибка обработки сообщения: {e}")
 
+def _parse_datetime(value) -> Optional[datetime]:
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
 
-async def main():
-    nats_url = os.getenv("NATS_URL", "nats://localhost:4222")
 
-    logger.info(f"Запуск подписчика NATS. Подключение к: {nats_url}")
+def _percentile(samples: list[float], fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
 
-    max_retries = 10
-    retry_delay = 5
+class RateMaterializer:
+    def __init__(
+            self,
+            database_url: str = settings.SUBSCRIBER_DATABASE_URL,
+            queue_group: str = settings.SUBSCRIBER_QUEUE_GROUP,
+            batch_size: int = settings.SUBSCRIBER_BATCH_SIZE,
+            flush_interval: float = settings.SUBSCRIBER_FLUSH_INTERVAL,
+            report_interval: float = settings.SUBSCRIBER_REPORT_INTERVAL,
+            dedup_size: int = settings.SUBSCRIBER_DEDUP_SIZE
+    ):
+        self.database_url = database_url
+        self.queue_group = queue_group
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.report_interval = report_interval
+        self.dedup_size = dedup_size
+        self.subject = f"{settings.NATS_CHANNEL}.>"
 
-    for attempt in range(max_retries):
+        _, self.engine, _ = create_engines(database_url)
+        self.sessions = async_sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
+        self.nc = NATS()
+
+        self.pending: OrderedDict[tuple[str, str], tuple[str, dict, datetime]] = OrderedDict()
+        self.seen: OrderedDict[tuple, None] = OrderedDict()
+        self.applied_at: dict[tuple[str, str], datetime] = {}
+        self.lags: list[float] = []
+
+        self.received = 0
+        self.duplicates = 0
+        self.stale = 0
+        self.invalid = 0
+        self.applied = 0
+        self.batches = 0
+        self._reported_received = 0
+        self._reported_applied = 0
+        self._ready = False
+        self._wakeup = asyncio.Event()
+        self._stopping = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+
+    async def init_store(self):
+        async with self.engine.begin() as conn:
+            await conn.run_sync(CurrencyRate.metadata.create_all, tables=[CurrencyRate.__table__])
+        logger.info(f"Локальное хранилище курсов: {self.database_url}")
+
+    async def connect(self):
+        for attempt in range(MAX_RETRIES):
+            try:
+                await self.nc.connect(
+                    servers=[settings.NATS_URL],
+                    reconnect_time_wait=RETRY_DELAY,
+                    max_reconnect_attempts=-1
+                )
+                logger.info(f"Подключено к NATS по адресу {settings.NATS_URL}")
+                return
+            except Exception as e:
+                logger.error(f"Попытка {attempt + 1}/{MAX_RETRIES} не удалась: {e}")
+                if attempt < MAX_RETRIES - 1:
+                    await asyncio.sleep(RETRY_DELAY)
+        raise ConnectionError("Достигнуто максимальное число попыток подключения к NATS")
+
+    async def _on_message(self, msg):
+        received_at = datetime.utcnow()
         try:
-            nc = NATS()
-            await nc.connect(
-                servers=[nats_url],
-                reconnect_time_wait=5,
-                max_reconnect_attempts=-1
+            message = loads(msg.data)
+            data = message["data"]
+            pair = (data["base_currency"], data["target_currency"])
+            timestamp = _parse_datetime(message["timestamp"])
+            action = message.get("action", "updated")
+        except (ValueError, KeyError, TypeError) as e:
+            self.invalid += 1
+            logger.error(f"Некорректное сообщение NATS [{msg.subject}]: {e}")
+            return
+
+        self.received += 1
+        key = (message.get("origin"), msg.subject, message["timestamp"])
+        if key in self.seen:
+            self.duplicates += 1
+            return
+        self.seen[key] = None
+        if len(self.seen) > self.dedup_size:
+            self.seen.popitem(last=False)
+
+        latest = self.pending.get(pair)
+        newest = latest[2] if latest is not None else self.applied_at.get(pair)
+        if newest is not None and timestamp < newest:
+            self.stale += 1
+            return
+
+        self.lags.append(max((received_at - timestamp).total_seconds(), 0.0))
+        self.pending[pair] = (action, data, timestamp)
+        self.pending.move_to_end(pair)
+        if len(self.pending) >= self.batch_size:
+            self._wakeup.set()
+
+    async def bootstrap(self, snapshot_url: str = settings.SUBSCRIBER_SNAPSHOT_URL):
+        if not snapshot_url:
+            return
+        url = f"{snapshot_url.rstrip('/')}{settings.API_V1_PREFIX}/currency/rates"
+        async with httpx.AsyncClient(timeout=30) as client:
+            response = await client.get(url)
+            response.raise_for_status()
+            rates = response.json()
+
+        async with self.sessions() as db:
+            await self._upsert(db, rates)
+            snapshot = {(rate["base_currency"], rate["target_currency"]) for rate in rates}
+            result = await db.execute(select(CurrencyRate.base_currency, CurrencyRate.target_currency))
+            stale = [pair for pair in result.tuples().all() if pair not in snapshot]
+            for start in range(0, len(stale), self.batch_size):
+                await db.execute(
+                    delete(CurrencyRate).where(
+                        tuple_(CurrencyRate.base_currency, CurrencyRate.target_currency).in_(
+                            stale[start:start + self.batch_size]
+                        )
+                    )
+                )
+            await db.commit()
+        logger.info(f"Загружен начальный снимок: {len(rates)} курсов из {url}, удалено устаревших: {len(stale)}")
+
+    async def _upsert(self, db: AsyncSession, rates: list[dict]):
+        if not rates:
+            return
+        await db.execute(
+            delete(CurrencyRate).where(
+                CurrencyRate.id.in_([rate["id"] for rate in rates]),
+                tuple_(CurrencyRate.id, CurrencyRate.base_currency, CurrencyRate.target_currency).not_in(
+                    [(rate["id"], rate["base_currency"], rate["target_currency"]) for rate in rates]
+                )
             )
+        )
+        upsert = dialect_insert(db)
+        stmt = upsert(CurrencyRate.__table__)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[CurrencyRate.base_currency, CurrencyRate.target_currency],
+            set_={
+                "id": stmt.excluded.id,
+                "rate": stmt.excluded.rate,
+                "last_updated": stmt.excluded.last_updated
+            },
+            where=CurrencyRate.__table__.c.last_updated <= stmt.excluded.last_updated
+        )
+        await db.execute(stmt, [
+            {
+                "id": rate["id"],
+                "base_currency": rate["base_currency"],
+                "target_currency": rate["target_currency"],
+                "rate": rate["rate"],
+                "last_updated": _parse_datetime(rate.get("last_updated")) or datetime.utcnow()
+            }
+            for rate in rates
+        ])
+
+    async def _write(self, items: list[tuple]):
+        removed = [pair for pair, (action, _, _) in items if action == "deleted"]
+        changed = [data for _, (action, data, _) in items if action != "deleted"]
+        async with self.sessions() as db:
+            if removed:
+                await db.execute(
+                    delete(CurrencyRate).where(
+                        tuple_(CurrencyRate.base_currency, CurrencyRate.target_currency).in_(removed)
+                    )
+                )
+            await self._upsert(db, changed)
+            await db.commit()
+
+    async def _write_split(self, items: list[tuple]) -> list[tuple]:
+        try:
+            await self._write(items)
+            return items
+        except OperationalError:
+            raise
+        except (SQLAlchemyError, ValueError, KeyError, TypeError) as e:
+            if len(items) == 1:
+                pair = items[0][0]
+                logger.error(f"Обновление {pair[0]}/{pair[1]} отклонено хранилищем: {e}")
+                self.invalid += 1
+                return []
+            middle = len(items) // 2
+            return await self._write_split(items[:middle]) + await self._write_split(items[middle:])
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._ready or not self.pending:
+                return
+            batch, self.pending = self.pending, OrderedDict()
+
+            try:
+                applied = await self._write_split(list(batch.items()))
+            except OperationalError as e:
+                logger.error(f"Ошибка записи в локальное хранилище, пакет будет повторён: {e}")
+                for pair, item in batch.items():
+                    self.pending.setdefault(pair, item)
+                return
 
-            logger.info("Успешно подключено к серверу NATS")
+            for pair, (_, _, timestamp) in applied:
+                self.applied_at[pair] = timestamp
+            self.applied += len(applied)
+            self.batches += 1
 
-            await nc.subscribe("currency.updates", cb=message_handler)
-            await nc.subscribe("currency.*", cb=message_handler)
+    def report(self, elapsed: float):
+        lags, self.lags = self.lags, []
+        received = self.received - self._reported_received
+        applied = self.applied - self._reported_applied
+        self._reported_received, self._reported_applied = self.received, self.applied
+        logger.info(
+            f"Получено {received / elapsed:.1f}/с, записано {applied / elapsed:.1f}/с, "
+            f"задержка p50 {_percentile(lags, 0.5) * 1000:.0f} мс, p95 {_percentile(lags, 0.95) * 1000:.0f} мс, "
+            f"max {max(lags, default=0) * 1000:.0f} мс; в очереди {len(self.pending)}, "
+            f"дубликатов {self.duplicates}, устаревших {self.stale}, ошибок {self.invalid}"
+        )
 
-            logger.info("Подписано на каналы: currency.updates, currency.*")
-            logger.info("Ожидание сообщений...")
+    async def _run_flusher(self):
+        last_report = time.monotonic()
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
 
-            while True:
-                await asyncio.sleep(1)
+            now = time.monotonic()
+            if now - last_report >= self.report_interval:
+                self.report(now - last_report)
+                last_report = now
 
-        except Exception as e:
-            logger.error(f"Попытка {attempt + 1}/{max_retries} не удалась: {e}")
+    async def run(self):
+        await self.init_store()
+        await self.connect()
 
-            if attempt < max_retries - 1:
-                logger.info(f"Повтор через {retry_delay} секунд...")
-                await asyncio.sleep(retry_delay)
-            else:
-                logger.error("Достигнуто максимальное число попыток. Выход.")
-                break
+        subscription = await self.nc.subscribe(self.subject, queue=self.queue_group, cb=self._on_message)
+        logger.info(f"Подписано на {self.subject} (группа: {self.queue_group or '-'})")
+
+        await self.bootstrap()
+        self._ready = True
+        flusher = asyncio.create_task(self._run_flusher())
+
+        await self._stopping.wait()
+
+        await subscription.unsubscribe()
+        await flusher
+        await self.flush()
+        await self.nc.close()
+        await self.engine.dispose()
+        logger.info(f"Подписчик остановлен: записано {self.applied} обновлений в {self.batches} пакетах")
+
+    def stop(self):
+        self._stopping.set()
+        self._wakeup.set()
+
+
+async def main():
+    materializer = RateMaterializer()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, materializer.stop)
+    await materializer.run()
 
 
 if __name__ == "__main__":
     try:
         asyncio.run(main())
-    except KeyboardInterrupt:
-        logger.info("Подписчик остановлен")
     except Exception as e:
         logger.error(f"Фатальная ошибка: {e}")